@@ -3,6 +3,11 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The interview turn endpoints are async views and the SSE and speech
+streams are async generators, so serve the project through this entry
+point, e.g. ``uvicorn core.asgi:application --workers 4``. Under WSGI the
+async views still work, but each one holds a worker thread while it runs.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -95,30 +96,145 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.postgresql',
-#         'NAME': os.getenv('DB_NAME', 'postgres'),
-#         'USER': os.getenv('DB_USER', 'postgres'),
-#         'PASSWORD': os.getenv('DB_PASSWORD'),
-#         'HOST': os.getenv('DB_HOST'),
-#         'PORT': '5432',
-#     }
-# }
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',  # This creates the file in your project root
+# SQLite by default. DB_ENGINE=postgres switches to a PostgreSQL server, which
+# lets concurrent interviews write without contending on a single file lock.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'postgres'),
+            'USER': os.getenv('DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('DB_PASSWORD'),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # Verify a reused connection is still alive before handing it out
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
-}
+    if os.getenv('DB_POOL', 'True') == 'True':
+        # Process-wide psycopg pool shared by request, job and streaming threads.
+        # Django requires CONN_MAX_AGE=0 with a pool; connections go back to the pool instead.
+        from psycopg_pool import ConnectionPool
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+                'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+                'check': ConnectionPool.check_connection,
+            }
+        }
+    else:
+        # Persistent per-thread connections
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',  # This creates the file in your project root
+        }
+    }
+    if os.getenv('SQLITE_TUNING', 'False') == 'True':
+        # Opt-in profile for single-node deployments: WAL lets readers run
+        # alongside the writer, and writers wait for the lock instead of
+        # failing with "database is locked"
+        DATABASES['default']['OPTIONS'] = {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                f"PRAGMA synchronous={os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')};"
+                f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))};"
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            # Busy timeout, in seconds
+            'timeout': float(os.getenv('SQLITE_BUSY_TIMEOUT', '20')),
+            # Take the write lock at BEGIN so a transaction never fails upgrading a read lock
+            'transaction_mode': 'IMMEDIATE',
+        }
 
 AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
 AWS_DEFAULT_REGION = os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
 ASSEMBLY_AI = os.environ.get('ASSEMBLY_AI')
+# Development only: skip TLS verification for AssemblyAI on machines missing CA certificates
+ASSEMBLY_AI_VERIFY_SSL = os.environ.get('ASSEMBLY_AI_VERIFY_SSL', 'True') == 'True'
 
 AWS_STORAGE_BUCKET_NAME = 'devproctor-audio-temp'
+
+# LLM backend: 'bedrock' (default) or 'fake' for offline tests
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'bedrock')
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '50'))
+# Number of sentences synthesized ahead when streaming interviewer audio
+TTS_MAX_PARALLEL = int(os.environ.get('TTS_MAX_PARALLEL', '3'))
+# Synthesized replies are served from short-lived blobs instead of base64 in JSON
+AUDIO_BLOB_DIR = os.environ.get('AUDIO_BLOB_DIR', os.path.join(tempfile.gettempdir(), 'ai-interviewer-audio'))
+AUDIO_BLOB_TTL = int(os.environ.get('AUDIO_BLOB_TTL', '900'))
+# Synthesized speech cache: in-memory LRU in front of an on-disk tier
+TTS_CACHE_MAX_BYTES = int(os.environ.get('TTS_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'ai-interviewer-tts'))
+TTS_CACHE_MAX_FILES = int(os.environ.get('TTS_CACHE_MAX_FILES', '2000'))
+# Speech-to-text backend: 'assemblyai' (default), 'whisper' for a local CPU
+# model (needs faster-whisper installed) or 'fake' for offline tests
+STT_BACKEND = os.environ.get('STT_BACKEND', 'assemblyai')
+STT_WHISPER_MODEL = os.environ.get('STT_WHISPER_MODEL', 'base.en')
+STT_WHISPER_COMPUTE_TYPE = os.environ.get('STT_WHISPER_COMPUTE_TYPE', 'int8')
+# Concurrent local transcriptions per process
+STT_MAX_PARALLEL = int(os.environ.get('STT_MAX_PARALLEL', '2'))
+# Bitrate of the opus clips uploaded to hosted speech-to-text
+STT_OPUS_BITRATE = os.environ.get('STT_OPUS_BITRATE', '24k')
+# Audio answers are processed from memory; Django spills uploads larger than
+# FILE_UPLOAD_MAX_MEMORY_SIZE to a temporary file, and rejects those above the cap
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.environ.get('FILE_UPLOAD_MAX_MEMORY_SIZE', str(5 * 1024 * 1024)))
+AUDIO_UPLOAD_MAX_BYTES = int(os.environ.get('AUDIO_UPLOAD_MAX_BYTES', str(25 * 1024 * 1024)))
+# Local voice-activity detection: silent answers skip transcription and the
+# rest are trimmed first. Non-WAV audio is decoded with ffmpeg when available.
+VAD_ENABLED = os.environ.get('VAD_ENABLED', 'True') == 'True'
+VAD_ENERGY_THRESHOLD_DBFS = float(os.environ.get('VAD_ENERGY_THRESHOLD_DBFS', '-45'))
+VAD_MIN_SPEECH_MS = int(os.environ.get('VAD_MIN_SPEECH_MS', '250'))
+VAD_PADDING_MS = int(os.environ.get('VAD_PADDING_MS', '300'))
+# Needed to decode uploads other than WAV and to compress them to Opus; without
+# it they're sent to the transcriber as uploaded, or as uncompressed WAV
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+
+# Rolling per-interview conversation context used in prompts
+CONVERSATION_MEMORY_TOKENS = int(os.environ.get('CONVERSATION_MEMORY_TOKENS', '1500'))
+CONVERSATION_CACHE_SIZE = int(os.environ.get('CONVERSATION_CACHE_SIZE', '1000'))
+# Hard upper bound on the size of any generated prompt, in estimated tokens
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', '8000'))
+# Transcript entries that fall out of the rolling context are folded into a
+# running summary once this many have accumulated
+SUMMARY_SEGMENT_ENTRIES = int(os.environ.get('SUMMARY_SEGMENT_ENTRIES', '4'))
+SUMMARY_MAX_TOKENS = int(os.environ.get('SUMMARY_MAX_TOKENS', '400'))
+
+# Candidate ranking: concurrent per-candidate fit scoring, then a comparison of the shortlist.
+# Scoring runs in the request, so the candidates per ranking are capped; with the
+# defaults a cold ranking waits for at most 13 rounds of fit calls.
+RANKING_MAX_PARALLEL = int(os.environ.get('RANKING_MAX_PARALLEL', '8'))
+RANKING_MAX_CANDIDATES = int(os.environ.get('RANKING_MAX_CANDIDATES', '100'))
+RANKING_SHORTLIST_SIZE = int(os.environ.get('RANKING_SHORTLIST_SIZE', '10'))
+# Candidate embeddings used to pre-filter ranking to the nearest candidates.
+# 'auto' uses sentence-transformers when installed, else deterministic hashing.
+EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND', 'auto')
+EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+EMBEDDING_DIM = int(os.environ.get('EMBEDDING_DIM', '384'))
+CANDIDATE_PREFILTER_K = int(os.environ.get('CANDIDATE_PREFILTER_K', '50'))
+
+# Background job queue (resume analysis etc.). JOB_QUEUE_EAGER runs jobs inline.
+JOB_QUEUE_WORKERS = int(os.environ.get('JOB_QUEUE_WORKERS', '4'))
+JOB_QUEUE_EAGER = os.environ.get('JOB_QUEUE_EAGER', 'False') == 'True'
+JOB_QUEUE_MAX_ATTEMPTS = int(os.environ.get('JOB_QUEUE_MAX_ATTEMPTS', '3'))
+JOB_QUEUE_RETRY_BACKOFF = float(os.environ.get('JOB_QUEUE_RETRY_BACKOFF', '5'))
+# A job still deferring (RetryLater) this long after it was created fails
+JOB_QUEUE_MAX_DEFER_SECONDS = int(os.environ.get('JOB_QUEUE_MAX_DEFER_SECONDS', '1800'))
+# Jobs RUNNING longer than this are taken to be orphaned by a dead process
+JOB_QUEUE_STALE_AFTER = int(os.environ.get('JOB_QUEUE_STALE_AFTER', '600'))
+# How long start_interview waits for a resume analysis still in progress
+RESUME_ANALYSIS_WAIT_SECONDS = float(os.environ.get('RESUME_ANALYSIS_WAIT_SECONDS', '10'))
+
+# Content-addressed resume analysis cache (least recently used entries evicted first)
+RESUME_CACHE_MAX_ENTRIES = int(os.environ.get('RESUME_CACHE_MAX_ENTRIES', '5000'))
+RESUME_CACHE_MAX_BYTES = int(os.environ.get('RESUME_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
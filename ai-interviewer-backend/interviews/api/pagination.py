@@ -0,0 +1,50 @@
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+import base64
+
+
+def encode_cursor(created_at, pk):
+    """Opaque cursor pointing just past the given (created_at, id) position"""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{pk}".encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        (created_at, id) encoded in the cursor
+
+    Raises:
+        ValueError for a malformed cursor
+    """
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        position = parse_datetime(created_at), int(pk)
+    except (UnicodeError, ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+    if position[0] is None:
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def keyset_page(queryset, cursor, limit):
+    """
+    One page of a values() queryset (rows must include created_at and id),
+    newest first, using keyset pagination on (created_at, id).
+
+    Unlike OFFSET, the cost of a page doesn't grow with how deep it is: the
+    cursor becomes a range condition served by the (created_at, id) index.
+
+    Returns:
+        (rows, next_cursor); next_cursor is None on the last page
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    # One extra row tells us whether another page exists
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last['created_at'], last['id'])
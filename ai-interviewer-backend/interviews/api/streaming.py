@@ -0,0 +1,62 @@
+from django.http import StreamingHttpResponse
+import asyncio
+import json
+import traceback
+
+_DONE = object()
+# Turns still running after their client went away, kept until they finish
+_running = set()
+
+
+def sse_event(event, data):
+    """Format a single server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def stream_service_call(run):
+    """
+    Run an async service call and stream its output as SSE.
+
+    Args:
+        run: Coroutine function taking an on_token callback and returning
+             the final payload dict once the turn has been persisted
+
+    Emits 'token' events while the model generates, then a single 'done'
+    event with the final payload (or an 'error' event). The body is an
+    async generator, so under ASGI each event is sent as soon as it exists.
+    """
+    async def event_stream():
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        def on_token(text):
+            # Safe from the event loop and from worker threads alike
+            loop.call_soon_threadsafe(events.put_nowait, sse_event('token', {'text': text}))
+
+        async def turn():
+            try:
+                result = await run(on_token)
+                events.put_nowait(sse_event('done', result))
+            except Exception as e:
+                print(f"Error in streamed turn: {str(e)}")
+                print(traceback.format_exc())
+                events.put_nowait(sse_event('error', {'error': str(e)}))
+            finally:
+                events.put_nowait(_DONE)
+
+        # Flush headers and open the stream before the first token arrives
+        yield ": stream open\n\n"
+        # A client disconnect doesn't cancel the turn: it still gets saved
+        task = asyncio.ensure_future(turn())
+        _running.add(task)
+        task.add_done_callback(_running.discard)
+        while True:
+            item = await events.get()
+            if item is _DONE:
+                break
+            yield item
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
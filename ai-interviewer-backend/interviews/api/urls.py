@@ -4,9 +4,14 @@ from . import views
 urlpatterns = [
     path('test/', views.test_view, name='test-view'),
     path('register/', views.register_candidate, name='register-candidate'),
+    path('candidate/<uuid:candidate_id>/analysis/', views.candidate_analysis_status, name='candidate-analysis-status'),
     path('interview/start/<uuid:candidate_id>/', views.start_interview, name='start-interview'),
     path('interview/respond/<int:interview_id>/', views.process_response, name='process-response'),
     path('interview/respond-audio/<int:interview_id>/', views.process_audio_response, name='process-audio-response'),
+    path('interview/stream/start/<uuid:candidate_id>/', views.stream_start_interview, name='stream-start-interview'),
+    path('interview/stream/respond/<int:interview_id>/', views.stream_process_response, name='stream-process-response'),
+    path('interview/speech/<int:interview_id>/', views.stream_interview_speech, name='stream-interview-speech'),
+    path('audio/<str:blob_id>/', views.get_audio, name='get-audio'),
     path('interview/report/<int:interview_id>/', views.get_interview_report, name='get-interview-report'),
     path('delete-all/', views.delete_all_data, name='delete-all-data'),
     path('interview/responses/', views.get_interview_responses, name='get-interview-responses'),
@@ -2,25 +2,36 @@
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from rest_framework import status
-from ..models import Candidate
 from .serializers import CandidateSerializer
-from ..services.resume_processor import ResumeProcessor 
-from ..services.interview_service import InterviewService
-# import whisper
-import boto3
-import tempfile
+from ..services.interview_service import InterviewService, ResumeAnalysisPending
+from ..services.tasks import enqueue_resume_analysis
+from ..services.speech_service import synthesize_speech, stream_speech
+from ..services.audio_store import save_audio, get_audio_path
+from ..services.embedding_index import get_candidate_index, clear_candidate_index
+from ..services.conversation_memory import get_conversation_memory
+from ..services.speech_to_text import get_transcriber
+from ..services.audio_prep import prepare_audio
+from .streaming import stream_service_call
+from .pagination import keyset_page
+from django.http import StreamingHttpResponse, JsonResponse, HttpResponse
+from django.views.decorators.http import require_GET, require_POST
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime, timedelta
+import re
 import os
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from asgiref.sync import async_to_sync
-from ..models import InterviewQuestion, Interview, Candidate ,HRUser
+import json
+from asgiref.sync import sync_to_async
+from ..models import (
+    InterviewQuestion, Interview, Candidate ,HRUser, BackgroundJob, TranscriptEntry, ConversationState,
+    CandidateFitScore, CandidateEmbedding, ResumeAnalysisCache
+)
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-import assemblyai as aai
+from django.core.management.color import no_style
+from django.db import connection, transaction
 
-# whisper_model = whisper.load_model("tiny")
-polly_client = boto3.client('polly' , region_name='us-east-1')
 os.environ["AWS_ACCESS_KEY_ID"] = settings.AWS_ACCESS_KEY_ID
 os.environ["AWS_SECRET_ACCESS_KEY"] = settings.AWS_SECRET_ACCESS_KEY
 os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
@@ -42,8 +53,6 @@ def register_candidate(request):
         resume = request.FILES.get('resume')
         print(f"Received email: {email}")
         print(f"Received resume: {resume}")
-        print("Calling Bedrock (Claude) for resume analysis...")
-        print("Django AWS identity:", boto3.client("sts").get_caller_identity())
         
         # Check if email is provided
         if not email:
@@ -75,16 +84,11 @@ def register_candidate(request):
         )
         print(f"Candidate created with ID: {candidate.id}")
 
-        # Process resume
-        processor = ResumeProcessor()
-        print(f"Processing resume at path: {candidate.resume.path}")
-        resume_analysis = processor.process_resume(candidate.resume.path)
-        print(f"Resume analysis result: {resume_analysis}")
-        
-        # Update candidate with analysis
-        candidate.resume_analysis = resume_analysis
-        candidate.save()
-        print("Candidate updated with resume analysis.")
+        # Analyze resume in the background; poll candidate_analysis_status for the result
+        job = enqueue_resume_analysis(candidate)
+        print(f"Queued resume analysis job {job.id} for {candidate.resume.path}")
+        # In eager mode the job has already stored its result
+        candidate.refresh_from_db(fields=['resume_analysis', 'analysis_status'])
 
         serializer = CandidateSerializer(candidate)
         print("Candidate serialized successfully.")
@@ -92,7 +96,8 @@ def register_candidate(request):
             'message': 'Registration successful',
             'candidate_id': candidate.id,
             'data': serializer.data,
-            'resume_analysis': resume_analysis,
+            'resume_analysis': candidate.resume_analysis,
+            'analysis_status': candidate.analysis_status,
             'status': 'SUCCESS'
         }, status=status.HTTP_201_CREATED)
 
@@ -105,21 +110,53 @@ def register_candidate(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
 
-@api_view(['POST'])
-def process_response(request, interview_id):
+@api_view(['GET'])
+def candidate_analysis_status(request, candidate_id):
+    """Poll the background resume analysis for a registered candidate"""
     try:
-        user_input = request.data.get('response')
+        candidate = Candidate.objects.get(id=candidate_id)
+    except Candidate.DoesNotExist:
+        return Response({'error': 'Candidate not found'}, status=status.HTTP_404_NOT_FOUND)
+    job = BackgroundJob.objects.filter(
+        ref=f"candidate:{candidate.id}"
+    ).order_by('-created_at').first()
+    return Response({
+        'candidate_id': candidate.id,
+        'analysis_status': candidate.analysis_status,
+        'resume_analysis': candidate.resume_analysis if candidate.analysis_status == 'READY' else None,
+        'attempts': job.attempts if job else 0,
+        'last_error': job.last_error if job else None
+    })
+
+
+# The turn endpoints are native async views: while the model, speech and
+# transcription calls are in flight no worker thread is held, so one ASGI
+# worker (core/asgi.py) serves many interviews at once. They are plain Django
+# views since DRF's api_view is sync only.
+
+@csrf_exempt
+@require_POST
+async def process_response(request, interview_id):
+    try:
+        user_input = _request_data(request).get('response')
         service = InterviewService()
-        response = service.process_response(interview_id, user_input)
+        response = await service.aprocess_response(interview_id, user_input)
         # Check if interview is complete
         
-        interview = Interview.objects.get(id=interview_id)
-        return Response({
+        interview = await Interview.objects.only('interview_complete').aget(id=interview_id)
+        return JsonResponse({
             **response,
             'interview_complete': interview.interview_complete
         })
     except Exception as e:
-        return Response({'error': str(e)}, status=400)
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def _request_data(request):
+    """Fields of a JSON or form-encoded request body"""
+    if request.content_type == 'application/json':
+        return json.loads(request.body or b'{}')
+    return request.POST
 
 @api_view(['POST'])
 def smart_requirement_analysis(request):
@@ -138,23 +175,25 @@ def smart_requirement_analysis(request):
         interviews = Interview.objects.filter(
             interview_complete=True,
             detailed_report__isnull=False
-        ).select_related('candidate')
-        
-        if not interviews:
+        )
+
+        if not interviews.exists():
             return Response({
                 'error': 'No completed interviews found for analysis'
             }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Format candidate data for analysis
-        candidate_data = []
-        for interview in interviews:
-            candidate_data.append({
-                'interview_id': interview.id,
-                'candidate_email': interview.candidate.email,
-                'final_score': interview.final_score,
-                'detailed_report': interview.detailed_report,
-            })
-        
+
+        # Narrow large pools to the nearest candidates before any LLM call,
+        # never past what the service ranks in one request
+        prefilter_k = min(settings.CANDIDATE_PREFILTER_K, settings.RANKING_MAX_CANDIDATES)
+        if interviews.count() > prefilter_k:
+            index = get_candidate_index()
+            index.index_missing(interviews)
+            nearest = index.nearest(f"{job_title}\n{job_description}", prefilter_k)
+            interviews = interviews.filter(id__in=[interview_id for interview_id, _ in nearest])
+
+        # The service loads the columns it needs for all candidates at once
+        candidate_data = [{'interview_id': interview_id} for interview_id in interviews.values_list('id', flat=True)]
+
         # Use the interview service for analysis
         service = InterviewService()
         recommendations = service.analyze_job_candidates(job_title, job_description, candidate_data)
@@ -382,117 +421,137 @@ def smart_requirement_analysis(request):
 #         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 # New endpoint: Get detailed interview report for HR
 
-@api_view(['POST'])
-def process_audio_response(request, interview_id):
+@csrf_exempt
+@require_POST
+async def process_audio_response(request, interview_id):
     try:
-        # Import the AssemblyAI SDK
-        import ssl
-        
-        # Create an unverified context - FOR DEVELOPMENT ONLY
-        ssl._create_default_https_context = ssl._create_unverified_context
-        
-        # Set the API key
-        aai.settings.api_key = settings.ASSEMBLY_AI
-        
         audio_file = request.FILES.get('audio')
         if not audio_file:
-            return Response({'error': 'Audio file is required'}, status=status.HTTP_400_BAD_REQUEST)
+            return JsonResponse({'error': 'Audio file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if audio_file.size > settings.AUDIO_UPLOAD_MAX_BYTES:
+            return JsonResponse({'error': 'Audio file is too large'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
         
         content_type = audio_file.content_type
         print(f"Received audio with content type: {content_type}")
         
-        # Determine file suffix
-        if 'webm' in content_type:
-            suffix = '.webm'
-        elif 'ogg' in content_type:
-            suffix = '.ogg'
-        elif 'mp4' in content_type:
-            suffix = '.mp4'
-        else:
-            suffix = '.wav'
-        
-        # Save file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_audio:
-            for chunk in audio_file.chunks():
-                temp_audio.write(chunk)
-            temp_audio_path = temp_audio.name
+        # The upload is used as Django received it: held in memory, or spilled
+        # to a temporary file of its own above FILE_UPLOAD_MAX_MEMORY_SIZE.
+        # Nothing is copied to disk here.
         
-        try:
-            # Use the SDK's Transcriber
-            transcriber = aai.Transcriber()
-            
+        # Backend chosen by settings.STT_BACKEND
+        transcriber = get_transcriber()
+        # Trim, downmix, resample and compress for the transcriber; silent
+        # answers are caught here, without a transcription round trip
+        speech = await sync_to_async(prepare_audio, thread_sensitive=False)(
+            audio_file, transcriber.sample_rate, transcriber.audio_format
+        )
+        if speech is None:
+            print("No speech detected")
+            transcribed_text = ""
+        else:
             # Start transcription and wait for completion
-            print("Starting transcription with AssemblyAI SDK...")
-            transcript = transcriber.transcribe(temp_audio_path)
-            
-            # Get the transcribed text
-            transcribed_text = transcript.text if transcript.text else ""
+            print(f"Starting transcription with {transcriber.name}...")
+            transcribed_text = await transcriber.atranscribe(speech)
             print(f"Transcription complete: '{transcribed_text}'")
-            
-            # Process the transcribed text
-            service = InterviewService()
-            if not transcribed_text:
-                response = service.handle_silence(interview_id)
-            else:
-                response = service.process_response(interview_id, transcribed_text)
-            
-            # Check if interview is complete
-            interview = Interview.objects.get(id=interview_id)
-            
-            # Generate audio response with Polly
-            polly_response = polly_client.synthesize_speech(
-                Text=response['message'],
-                OutputFormat='mp3',
-                VoiceId='Joanna',
-                Engine='standard'
-            )
-            
-            import base64
-            audio_data = polly_response['AudioStream'].read()
-            encoded_audio = base64.b64encode(audio_data).decode('ascii')
-            
-            return Response({
-                'text_response': response,
-                'audio_response': encoded_audio,
-                'transcribed_text': transcribed_text,
-                'interview_complete': interview.interview_complete
-            })
-            
-        finally:
-            # Clean up temporary file
-            os.unlink(temp_audio_path)
+        
+        # Process the transcribed text
+        service = InterviewService()
+        if not transcribed_text:
+            response = await service.ahandle_silence(interview_id)
+        else:
+            response = await service.aprocess_response(interview_id, transcribed_text)
+        
+        # Check if interview is complete
+        interview = await Interview.objects.only('interview_complete').aget(id=interview_id)
+        
+        # Generate audio response with Polly
+        return JsonResponse({
+            'text_response': response,
+            **await _aaudio_payload(request, interview_id, response['message'], engine='standard'),
+            'transcribed_text': transcribed_text,
+            'interview_complete': interview.interview_complete
+        })
             
     except Exception as e:
         import traceback
         print(traceback.format_exc())
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-# New endpoint: Get all interview emails and dates
+# HR interview list, one page at a time
 @api_view(['GET'])
 def get_interview_responses(request):
-    """Return all interview candidate emails, interview ids, and interview dates."""
-    interviews = Interview.objects.select_related('candidate').all().order_by('-created_at')
+    """
+    Page through interviews, newest first.
+
+    Query params:
+        limit: page size (default 50, max 200)
+        cursor: next_cursor from the previous page
+        complete: 'true' or 'false' to filter on interview completion
+        date_from, date_to: ISO dates (inclusive) on the interview date
+        min_score, max_score: range on the final score
+    """
+    params = request.query_params
+    try:
+        limit = min(max(int(params.get('limit', 50)), 1), 200)
+        interviews = Interview.objects.all()
+        if params.get('complete') in ('true', 'false'):
+            interviews = interviews.filter(interview_complete=params['complete'] == 'true')
+        # Plain range conditions on created_at so the index still applies
+        if params.get('date_from'):
+            interviews = interviews.filter(created_at__gte=_start_of_day(params['date_from']))
+        if params.get('date_to'):
+            interviews = interviews.filter(created_at__lt=_start_of_day(params['date_to']) + timedelta(days=1))
+        if params.get('min_score'):
+            interviews = interviews.filter(final_score__gte=float(params['min_score']))
+        if params.get('max_score'):
+            interviews = interviews.filter(final_score__lte=float(params['max_score']))
+        # Only the columns the list shows; reports and transcripts stay in the database
+        rows, next_cursor = keyset_page(
+            interviews.values('id', 'created_at', 'interview_complete', 'final_score', 'candidate__email'),
+            params.get('cursor'),
+            limit
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     data = [
         {
-            'interview_id': interview.id,
-            'email': interview.candidate.email,
-            'interview_date': interview.created_at
+            'interview_id': row['id'],
+            'email': row['candidate__email'],
+            'interview_date': row['created_at'],
+            'interview_complete': row['interview_complete'],
+            'final_score': row['final_score']
         }
-        for interview in interviews
+        for row in rows
     ]
-    return Response({'interviews': data})
+    return Response({'interviews': data, 'next_cursor': next_cursor})
+
+def _start_of_day(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f"Invalid date: {value}")
+    return timezone.make_aware(datetime.combine(parsed, datetime.min.time()))
 
 @api_view(['GET'])
 def get_interview_report(request, interview_id):
     """Get the detailed interview report (protected endpoint for HR)"""
     try:
         interview = Interview.objects.get(id=interview_id)
+        if interview.report_status == 'PENDING':
+            return Response({
+                'interview_id': interview_id,
+                'report_status': 'PENDING',
+                'interview_complete': interview.interview_complete,
+                'message': 'Report is being generated'
+            }, status=status.HTTP_202_ACCEPTED)
         if not interview.detailed_report:
             return Response({
-                'error': 'No report available for this interview'
+                'error': 'No report available for this interview',
+                'report_status': interview.report_status
             }, status=status.HTTP_404_NOT_FOUND)
         return Response({
             'interview_id': interview_id,
+            'report_status': 'READY',
             'candidate_email': interview.candidate.email,
             'detailed_report': interview.detailed_report,
             'final_score': interview.final_score,
@@ -508,58 +567,178 @@ def get_interview_report(request, interview_id):
             'error': str(e)
         }, status=status.HTTP_400_BAD_REQUEST)
     
-@api_view(['POST'])
-def start_interview(request, candidate_id):
+def _audio_payload(request, interview_id, text, engine):
+    """
+    Audio part of a turn response. The JSON only carries a URL: with
+    ?audio=stream one that streams the reply sentence by sentence, otherwise
+    one for the fully synthesized MP3 stored as a short-lived blob.
+    """
+    if request.GET.get('audio') == 'stream':
+        url = reverse('stream-interview-speech', args=[interview_id])
+        return {'audio_stream_url': request.build_absolute_uri(f"{url}?engine={engine}")}
+    blob_id = save_audio(synthesize_speech(text, engine=engine))
+    return {'audio_url': request.build_absolute_uri(reverse('get-audio', args=[blob_id]))}
+
+
+# Polly has no async client; synthesis runs in the shared executor, off the
+# request's own thread, since it doesn't touch the database
+_aaudio_payload = sync_to_async(_audio_payload, thread_sensitive=False)
+
+
+@require_GET
+def get_audio(request, blob_id):
+    """
+    Serve a synthesized audio blob with range and caching support.
+
+    Blobs are a single spoken reply, so they are read into one response
+    rather than streamed: under ASGI a file iterator would be buffered
+    anyway, with a warning on every request.
+    """
+    path = get_audio_path(blob_id)
+    if path is None:
+        return JsonResponse({'error': 'Audio not found or expired'}, status=status.HTTP_404_NOT_FOUND)
+    etag = f'"{blob_id}"'
+    cache_control = f"private, max-age={settings.AUDIO_BLOB_TTL}, immutable"
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    size = os.path.getsize(path)
+    range_match = re.match(r'^bytes=(\d*)-(\d*)$', request.headers.get('Range', ''))
+    if range_match and any(range_match.groups()):
+        start, end = range_match.groups()
+        if start:
+            start = int(start)
+            end = min(int(end), size - 1) if end else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(end), 0)
+            end = size - 1
+        if start > end or start >= size:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            return response
+        with open(path, 'rb') as audio_file:
+            audio_file.seek(start)
+            data = audio_file.read(end - start + 1)
+        response = HttpResponse(data, status=206, content_type='audio/mpeg')
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    else:
+        with open(path, 'rb') as audio_file:
+            response = HttpResponse(audio_file.read(), content_type='audio/mpeg')
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+@require_GET
+async def stream_interview_speech(request, interview_id):
+    """Stream the interviewer's latest message as MP3, synthesized sentence by sentence"""
+    # Plain Django view: <audio> elements don't send Accept headers DRF would negotiate
+    if not await Interview.objects.filter(id=interview_id).aexists():
+        return JsonResponse({'error': 'Interview not found'}, status=status.HTTP_404_NOT_FOUND)
+    message = await TranscriptEntry.objects.filter(
+        interview_id=interview_id,
+        speaker='interviewer'
+    ).order_by('-sequence').values_list('text', flat=True).afirst()
+    if not message:
+        return JsonResponse({'error': 'Nothing to say yet'}, status=status.HTTP_404_NOT_FOUND)
+    engine = request.GET.get('engine', 'neural')
+    if engine not in ('neural', 'standard'):
+        return JsonResponse({'error': 'Unsupported engine'}, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(stream_speech(message, engine=engine), content_type='audio/mpeg')
+    response['Cache-Control'] = 'no-store'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def start_interview(request, candidate_id):
     try:
         service = InterviewService()
         
         # Call the interview service
-        response = service.start_interview(candidate_id)
-        
-        # Regular synchronous call to Polly
-        polly_response = polly_client.synthesize_speech(
-            Text=response['message'],
-            OutputFormat='mp3',
-            VoiceId='Joanna',
-            Engine='neural'
-        )
+        response = await service.astart_interview(candidate_id)
         
-        # Get audio data - this is binary
-        audio_data = polly_response['AudioStream'].read()
-        
-        # Return binary data as base64
-        import base64
-        encoded_audio = base64.b64encode(audio_data).decode('ascii')
-        
-        # Return both text and encoded audio response
-        return Response({
+        # Return both text and audio response
+        return JsonResponse({
             'text_response': response,
-            'audio_response': encoded_audio
+            **await _aaudio_payload(request, response['interview_id'], response['message'], engine='neural')
         })
+    except ResumeAnalysisPending as e:
+        return JsonResponse({
+            'status': 'ANALYSIS_PENDING',
+            'analysis_status': e.analysis_status,
+            'message': 'Your resume is still being analyzed. Please try again in a few seconds.'
+        }, status=status.HTTP_202_ACCEPTED)
     except Exception as e:
         import traceback
         print(traceback.format_exc())
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
+@csrf_exempt
+@require_POST
+async def stream_start_interview(request, candidate_id):
+    """Start or resume an interview, streaming the greeting as server-sent events"""
+    async def run(on_token):
+        try:
+            response = await InterviewService(on_token=on_token).astart_interview(candidate_id)
+        except ResumeAnalysisPending as e:
+            return {
+                'status': 'ANALYSIS_PENDING',
+                'analysis_status': e.analysis_status,
+                'message': 'Your resume is still being analyzed. Please try again in a few seconds.'
+            }
+        return {'text_response': response}
+    return stream_service_call(run)
+
+
+@csrf_exempt
+@require_POST
+async def stream_process_response(request, interview_id):
+    """Process a text answer, streaming the interviewer's reply as server-sent events"""
+    user_input = _request_data(request).get('response')
+
+    async def run(on_token):
+        response = await InterviewService(on_token=on_token).aprocess_response(interview_id, user_input)
+        interview = await Interview.objects.only('interview_complete').aget(id=interview_id)
+        return {
+            'text_response': response,
+            'interview_complete': interview.interview_complete
+        }
+    return stream_service_call(run)
+
+
 @api_view(['POST'])
 def delete_all_data(request):
     try:
-        # Delete all InterviewQuestion, Interview, and Candidate records
-        
-        InterviewQuestion.objects.all().delete()
-        Interview.objects.all().delete()
-        Candidate.objects.all().delete()
-
-        # Reset auto-increment primary key sequences for each model
-        from django.db import connection
-        table_names = [
-            InterviewQuestion._meta.db_table,
-            Interview._meta.db_table,
-            Candidate._meta.db_table
+        # Delete every candidate and interview, with everything derived from them.
+        # Ids restart afterwards, so nothing may be left keyed by an old id.
+        models_to_clear = [
+            CandidateFitScore, CandidateEmbedding, ConversationState, InterviewQuestion, TranscriptEntry,
+            Interview, Candidate, BackgroundJob, ResumeAnalysisCache
         ]
-        with connection.cursor() as cursor:
-            for table in table_names:
-                cursor.execute(f"DELETE FROM sqlite_sequence WHERE name='{table}'")
+        with transaction.atomic():
+            for model in models_to_clear:
+                model.objects.all().delete()
+
+            # Reset auto-increment primary key sequences, in whatever form the database keeps them
+            with connection.cursor() as cursor:
+                sequences = []
+                for model in models_to_clear:
+                    sequences.extend(connection.introspection.get_sequences(
+                        cursor, model._meta.db_table, model._meta.local_fields
+                    ))
+                for sql in connection.ops.sequence_reset_by_name_sql(no_style(), sequences):
+                    cursor.execute(sql)
+
+            # This process's caches; other workers revalidate against the rows
+            transaction.on_commit(get_conversation_memory().clear)
+            transaction.on_commit(clear_candidate_index)
 
         return Response({'message': 'All interview data deleted and primary keys reset.'}, status=status.HTTP_200_OK)
     except Exception as e:
@@ -1,6 +1,28 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
 
 
 class InterviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'interviews'
+
+    def ready(self):
+        # Register background job handlers
+        from .services import tasks  # noqa: F401
+        if not settings.JOB_QUEUE_EAGER:
+            # Not here: ready() also runs for migrate and other commands
+            request_started.connect(_recover_jobs, dispatch_uid='interviews-recover-jobs')
+
+
+def _recover_jobs(**kwargs):
+    """Once per serving process, pick up the jobs a previous process left queued"""
+    request_started.disconnect(dispatch_uid='interviews-recover-jobs')
+    from .services.job_queue import recover_jobs
+    try:
+        count = recover_jobs()
+    except Exception as e:
+        print(f"Could not recover background jobs: {str(e)}")
+        return
+    if count:
+        print(f"Recovered {count} background job(s)")
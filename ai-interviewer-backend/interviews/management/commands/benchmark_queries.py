@@ -0,0 +1,139 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from interviews.models import Candidate, Interview, InterviewQuestion
+import random
+import time
+import uuid
+
+# Indexes added for the hot lookups; each query is also timed with them dropped
+HOT_INDEXES = ['interview_candidate_done_idx', 'question_lookup_idx', 'interview_reported_idx']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Show query plans and timings of the hot interview lookups on generated data (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interviews', type=int, default=100000, help='Number of interviews to generate')
+        parser.add_argument('--questions', type=int, default=5, help='Questions per interview')
+        parser.add_argument('--completed', type=float, default=0.1, help='Share of interviews completed with a report')
+        parser.add_argument('--repeat', type=int, default=200, help='Runs per query')
+
+    def handle(self, *args, **options):
+        try:
+            # Everything, including dropping indexes, happens in one transaction that is rolled back
+            with transaction.atomic():
+                samples = self._populate(options['interviews'], options['questions'], options['completed'])
+                queries = self._queries(samples)
+                self.stdout.write(self.style.MIGRATE_HEADING("With indexes"))
+                with_indexes = self._run(queries, options['repeat'], 'with indexes')
+                with connection.cursor() as cursor:
+                    for name in HOT_INDEXES:
+                        cursor.execute(f'DROP INDEX "{name}"')
+                self.stdout.write(self.style.MIGRATE_HEADING("Without the hot lookup indexes"))
+                without_indexes = self._run(queries, options['repeat'], 'without indexes')
+                self.stdout.write(self.style.MIGRATE_HEADING("Summary (ms per query)"))
+                for label in queries:
+                    self.stdout.write(
+                        f"{label:<32} {with_indexes[label]:>10.3f} {without_indexes[label]:>10.3f}"
+                        f"   x{without_indexes[label] / max(with_indexes[label], 1e-6):.1f}"
+                    )
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write("Generated data rolled back")
+
+    def _populate(self, count, questions_per_interview, completed_share):
+        start = time.perf_counter()
+        run = uuid.uuid4().hex[:8]
+        candidates = [
+            Candidate(email=f"bench-{run}-{i}@example.com", resume='resumes/benchmark.pdf', analysis_status='READY')
+            for i in range(count)
+        ]
+        Candidate.objects.bulk_create(candidates, batch_size=5000)
+        interviews = Interview.objects.bulk_create([
+            Interview(
+                candidate=candidate,
+                current_question=questions_per_interview,
+                interview_complete=random.random() < completed_share,
+                detailed_report=None
+            ) for candidate in candidates
+        ], batch_size=5000)
+        # Only completed interviews get a report, as in production
+        Interview.objects.filter(
+            candidate__email__startswith=f"bench-{run}-",
+            interview_complete=True
+        ).update(detailed_report={'detailed_analysis': 'Benchmark report'}, final_score=7)
+        batch = []
+        for interview in interviews:
+            for number in range(1, questions_per_interview + 1):
+                batch.append(InterviewQuestion(
+                    interview=interview,
+                    question_number=number,
+                    question_text='Benchmark question',
+                    answer='Benchmark answer',
+                    question_type='excel_basic'
+                ))
+            if len(batch) >= 10000:
+                InterviewQuestion.objects.bulk_create(batch, batch_size=5000)
+                batch = []
+        InterviewQuestion.objects.bulk_create(batch, batch_size=5000)
+        # Give the planner statistics for the new rows, as a production database would have
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(
+            f"Generated {count} interviews and {count * questions_per_interview} questions "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        return random.sample(interviews, min(len(interviews), 1000))
+
+    def _queries(self, samples):
+        def pick():
+            return random.choice(samples)
+        return {
+            # InterviewService.start_interview
+            'unfinished interview': lambda: Interview.objects.filter(
+                candidate_id=pick().candidate_id,
+                interview_complete=False
+            ).first(),
+            # InterviewService.process_response
+            'latest question': lambda: InterviewQuestion.objects.filter(
+                interview_id=pick().id,
+                question_number=3
+            ).latest('created_at'),
+            # smart_requirement_analysis
+            'completed with report (count)': lambda: Interview.objects.filter(
+                interview_complete=True,
+                detailed_report__isnull=False
+            ).count(),
+        }
+
+    def _run(self, queries, repeat, variant):
+        timings = {}
+        for label, query in queries.items():
+            self.stdout.write(f"{label}:\n  {self._plan(query, variant)}")
+            start = time.perf_counter()
+            for _ in range(repeat):
+                query()
+            timings[label] = (time.perf_counter() - start) * 1000 / repeat
+            self.stdout.write(f"  {timings[label]:.3f} ms")
+        return timings
+
+    def _plan(self, query, variant):
+        # Capture the SQL the lookup runs and ask the database how it executes it
+        with connection.execute_wrapper(self._capture):
+            self._captured = None
+            query()
+        sql, params = self._captured
+        with connection.cursor() as cursor:
+            prefix = 'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+            # The variant comment keeps a plan cached before the DROP INDEX from being reused
+            cursor.execute(f"{prefix} {sql} /* {variant} */", params)
+            return "\n  ".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+
+    def _capture(self, execute, sql, params, many, context):
+        if self._captured is None:
+            self._captured = (sql, params)
+        return execute(sql, params, many, context)
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from interviews.services.audio_prep import prepare_audio
+from interviews.services.speech_to_text import get_transcriber
+import io
+import os
+import tempfile
+import time
+import wave
+import numpy as np
+
+
+class Command(BaseCommand):
+    help = "Compare bytes uploaded and transcription latency for raw uploads vs prepared audio"
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='Recorded answers to transcribe (default: a generated clip)')
+        parser.add_argument('--repeat', type=int, default=3, help='Transcriptions per file and variant')
+
+    def handle(self, *args, **options):
+        transcriber = get_transcriber()
+        files = options['files']
+        generated = None
+        if not files:
+            generated = files = [self._generate_clip()]
+            self.stdout.write("No files given: using a generated 48 kHz stereo WAV clip (a synthetic tone, so real backends return little or no text)")
+        self.stdout.write(f"Backend: {transcriber.name}, prepared as {transcriber.audio_format} at {transcriber.sample_rate} Hz")
+        try:
+            for path in files:
+                self._benchmark(transcriber, path, options['repeat'])
+        finally:
+            if generated:
+                os.unlink(generated[0])
+
+    def _benchmark(self, transcriber, path, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(os.path.basename(path)))
+        # Held in memory, like an upload below FILE_UPLOAD_MAX_MEMORY_SIZE
+        with open(path, 'rb') as audio_file:
+            raw = io.BytesIO(audio_file.read())
+        raw_ms, raw_text = self._transcribe(transcriber, raw, repeat)
+        self.stdout.write(f"  raw       {len(raw.getbuffer()):>10} bytes {raw_ms:>10.0f} ms  {raw_text[:60]!r}")
+
+        prepare_ms = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            prepared = prepare_audio(raw, transcriber.sample_rate, transcriber.audio_format)
+            prepare_ms.append((time.perf_counter() - start) * 1000)
+        if prepared is None:
+            self.stdout.write(f"  prepared  no speech detected, skipped in {np.median(prepare_ms):.0f} ms")
+            return
+        if prepared is raw:
+            self.stdout.write("  prepared  could not be decoded, would be sent unchanged")
+            return
+        transcribe_ms, text = self._transcribe(transcriber, prepared, repeat)
+        total_ms = np.median(prepare_ms) + transcribe_ms
+        self.stdout.write(
+            f"  prepared  {len(prepared.getbuffer()):>10} bytes {total_ms:>10.0f} ms  {text[:60]!r}"
+            f"  (preparation {np.median(prepare_ms):.0f} ms)"
+        )
+
+    def _transcribe(self, transcriber, audio, repeat):
+        timings = []
+        text = ""
+        for _ in range(repeat):
+            audio.seek(0)
+            start = time.perf_counter()
+            text = transcriber.transcribe(audio)
+            timings.append((time.perf_counter() - start) * 1000)
+        return float(np.median(timings)), text
+
+    def _generate_clip(self, rate=48000, seconds=(2.0, 4.0, 2.0)):
+        # Quiet lead-in, a voiced stretch of harmonics, then trailing quiet
+        lead, voiced, tail = (int(rate * s) for s in seconds)
+        t = np.arange(voiced) / rate
+        tone = sum(np.sin(2 * np.pi * f * t) / k for k, f in enumerate((180, 360, 540, 720), start=1)) * 0.2
+        signal = np.concatenate([np.zeros(lead), tone, np.zeros(tail)]) + np.random.randn(lead + voiced + tail) * 0.001
+        pcm = (np.clip(signal, -1, 1) * 32767).astype('<i2')
+        handle, path = tempfile.mkstemp(suffix='.wav')
+        os.close(handle)
+        with wave.open(path, 'wb') as target:
+            target.setnchannels(2)
+            target.setsampwidth(2)
+            target.setframerate(rate)
+            target.writeframes(np.repeat(pcm, 2).tobytes())
+        return path
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from interviews.models import Interview
+from interviews.services.embedding_index import get_candidate_index
+
+
+class Command(BaseCommand):
+    help = "Embed completed interviews that are missing from the candidate matching index"
+
+    def handle(self, *args, **options):
+        index = get_candidate_index()
+        interviews = Interview.objects.filter(interview_complete=True, detailed_report__isnull=False)
+        missing = interviews.exclude(embedding__model_name=index.embedder.name).count()
+        index.index_missing(interviews)
+        self.stdout.write(f"Indexed {missing} interviews with {index.embedder.name}")
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from interviews.services.job_queue import run_pending_jobs
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs. Web processes pick up what a restart left behind on their "
+        "first request; this runs jobs when no web process is serving, or as a dedicated worker with --loop"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls with --loop')
+        parser.add_argument('--stale-after', type=int, default=settings.JOB_QUEUE_STALE_AFTER,
+                            help='Requeue jobs stuck in RUNNING for longer than this many seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            count = run_pending_jobs(stale_after=options['stale_after'])
+            if count:
+                self.stdout.write(f"Processed {count} job(s)")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
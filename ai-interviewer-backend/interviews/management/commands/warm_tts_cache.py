@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from interviews.services.interview_service import SILENCE_REMINDER
+from interviews.services.speech_service import synthesize_speech
+
+# Fixed phrases spoken verbatim by the interviewer
+FIXED_PHRASES = [
+    SILENCE_REMINDER,
+]
+
+
+class Command(BaseCommand):
+    help = "Pre-render fixed interviewer phrases into the speech cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--text', action='append', default=[], help='Extra phrase to pre-render (repeatable)')
+        parser.add_argument('--engine', action='append', choices=['neural', 'standard'],
+                            help='Polly engine(s) to render for (default: both)')
+
+    def handle(self, *args, **options):
+        engines = options['engine'] or ['neural', 'standard']
+        for text in FIXED_PHRASES + options['text']:
+            for engine in engines:
+                audio = synthesize_speech(text, engine=engine)
+                self.stdout.write(f"[{engine}] {len(audio)} bytes: {text[:60]}")
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_analysed_candidates_ready(apps, schema_editor):
+    Candidate = apps.get_model('interviews', 'Candidate')
+    Candidate.objects.filter(resume_analysis__isnull=False).update(analysis_status='READY')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interviews', '0005_hruser'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackgroundJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_type', models.CharField(max_length=50)),
+                ('ref', models.CharField(blank=True, db_index=True, default='', max_length=100)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(db_index=True, default='QUEUED', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('max_attempts', models.IntegerField(default=3)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='candidate',
+            name='analysis_status',
+            field=models.CharField(default='PENDING', max_length=20),
+        ),
+        migrations.RunPython(mark_analysed_candidates_ready, migrations.RunPython.noop),
+    ]
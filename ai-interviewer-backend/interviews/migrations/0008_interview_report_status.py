@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:22
+
+from django.db import migrations, models
+
+
+def mark_existing_reports_ready(apps, schema_editor):
+    Interview = apps.get_model('interviews', 'Interview')
+    Interview.objects.filter(detailed_report__isnull=False).update(report_status='READY')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interviews', '0007_resumeanalysiscache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interview',
+            name='report_status',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.RunPython(mark_existing_reports_ready, migrations.RunPython.noop),
+    ]
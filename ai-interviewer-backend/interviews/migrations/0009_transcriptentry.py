@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:25
+
+import datetime
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def copy_transcripts_to_entries(apps, schema_editor):
+    Interview = apps.get_model('interviews', 'Interview')
+    TranscriptEntry = apps.get_model('interviews', 'TranscriptEntry')
+    for interview in Interview.objects.exclude(transcript__isnull=True).iterator():
+        entries = []
+        for sequence, item in enumerate(interview.transcript or [], start=1):
+            try:
+                timestamp = datetime.datetime.fromisoformat(item.get('timestamp'))
+                if timezone.is_naive(timestamp):
+                    timestamp = timezone.make_aware(timestamp)
+            except (TypeError, ValueError):
+                timestamp = interview.last_interaction
+            entries.append(TranscriptEntry(
+                interview_id=interview.id,
+                sequence=sequence,
+                speaker=item.get('speaker', ''),
+                text=item.get('text', ''),
+                timestamp=timestamp
+            ))
+        TranscriptEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interviews', '0008_interview_report_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.IntegerField()),
+                ('speaker', models.CharField(max_length=20)),
+                ('text', models.TextField()),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('interview', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transcript_entries', to='interviews.interview')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('interview', 'sequence'), name='unique_transcript_sequence')],
+            },
+        ),
+        migrations.RunPython(copy_transcripts_to_entries, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='interview',
+            name='transcript',
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interviews', '0011_conversationstate_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateFitScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_key', models.CharField(max_length=64)),
+                ('match_score', models.FloatField()),
+                ('fit', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('interview', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fit_scores', to='interviews.interview')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('job_key', 'interview'), name='unique_fit_per_job')],
+            },
+        ),
+    ]
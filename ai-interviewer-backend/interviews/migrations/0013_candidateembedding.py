@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interviews', '0012_candidatefitscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(db_index=True, max_length=100)),
+                ('dim', models.IntegerField()),
+                ('vector', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('interview', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='embedding', to='interviews.interview')),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interviews', '0014_interview_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='interview',
+            index=models.Index(fields=['candidate', 'interview_complete'], name='interview_candidate_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interview',
+            index=models.Index(condition=models.Q(('detailed_report__isnull', False), ('interview_complete', True)), fields=['created_at'], name='interview_reported_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interviewquestion',
+            index=models.Index(fields=['interview', 'question_number', 'created_at'], name='question_lookup_idx'),
+        ),
+    ]
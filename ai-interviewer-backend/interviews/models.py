@@ -1,6 +1,6 @@
 from django.db import models
 
-from django.db import models
+from django.utils import timezone
 
 import uuid
 
@@ -9,6 +9,7 @@ class Candidate(models.Model):
     email = models.EmailField(unique=True)
     resume = models.FileField(upload_to='resumes/', null=False, blank=False) 
     resume_analysis = models.JSONField(null=True, blank=True)
+    analysis_status = models.CharField(max_length=20, default='PENDING')  # PENDING, PROCESSING, READY, FAILED
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -21,14 +22,57 @@ class Interview(models.Model):
     last_interaction = models.DateTimeField(auto_now=True)
     feedback = models.JSONField(null=True, blank=True)
     detailed_report = models.JSONField(null=True, blank=True)
-    transcript = models.JSONField(null=True, blank=True)  # Store complete conversation
     final_score = models.FloatField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     interview_complete = models.BooleanField(default=False)  # New field for completion status
+    report_status = models.CharField(max_length=20, null=True, blank=True)  # PENDING, READY, FAILED
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the HR interview list
+            models.Index(fields=['created_at', 'id'], name='interview_created_id_idx'),
+            # start_interview: the candidate's unfinished interview
+            models.Index(fields=['candidate', 'interview_complete'], name='interview_candidate_done_idx'),
+            # smart_requirement_analysis: only the (few) completed interviews with a report
+            models.Index(
+                fields=['created_at'],
+                name='interview_reported_idx',
+                condition=models.Q(interview_complete=True, detailed_report__isnull=False)
+            ),
+        ]
 
     def __str__(self):
         return f"Interview for {self.candidate.email}"
 
+class TranscriptEntry(models.Model):
+    """One utterance of the interview conversation, stored append-only"""
+    interview = models.ForeignKey(Interview, on_delete=models.CASCADE, related_name='transcript_entries')
+    sequence = models.IntegerField()
+    speaker = models.CharField(max_length=20)  # interviewer, candidate
+    text = models.TextField()
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['interview', 'sequence'], name='unique_transcript_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.speaker} #{self.sequence} for interview {self.interview_id}"
+
+class ConversationState(models.Model):
+    """Compact rolling conversation context for an interview, kept within a token budget"""
+    interview = models.OneToOneField(Interview, on_delete=models.CASCADE, related_name='conversation_state')
+    messages = models.JSONField(default=list)  # most recent {speaker, text, sequence} entries, oldest first
+    token_count = models.IntegerField(default=0)
+    summary = models.TextField(blank=True, default='')  # condensed transcript up to summary_upto
+    summary_upto = models.IntegerField(default=0)  # last TranscriptEntry.sequence covered by summary
+    version = models.IntegerField(default=0)  # bumped on every write, validates in-process caches
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Conversation state for interview {self.interview_id}"
+
 class InterviewQuestion(models.Model):
     interview = models.ForeignKey(Interview, on_delete=models.CASCADE)
     question_number = models.IntegerField()
@@ -40,9 +84,71 @@ class InterviewQuestion(models.Model):
     response_time = models.IntegerField(null=True)  # in seconds
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # process_response: latest question with a given number in an interview
+            models.Index(fields=['interview', 'question_number', 'created_at'], name='question_lookup_idx'),
+        ]
+
     def __str__(self):
         return f"Q{self.question_number} for {self.interview.candidate.email}"
 
+class BackgroundJob(models.Model):
+    """Durable record of work handed to the background job queue"""
+    job_type = models.CharField(max_length=50)
+    ref = models.CharField(max_length=100, blank=True, default='', db_index=True)  # e.g. candidate:<uuid>
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, default='QUEUED', db_index=True)  # QUEUED, RUNNING, DONE, FAILED
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    last_error = models.TextField(null=True, blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.job_type} #{self.id} ({self.status})"
+
+class ResumeAnalysisCache(models.Model):
+    """Resume text and analysis keyed by a hash of the PDF bytes and prompt/model version"""
+    key = models.CharField(max_length=64, unique=True)
+    extracted_text = models.TextField()
+    analysis = models.JSONField()
+    size_bytes = models.IntegerField(default=0)
+    hit_count = models.IntegerField(default=0)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.key
+
+class CandidateFitScore(models.Model):
+    """How well one interviewed candidate fits a job description, cached per job description hash"""
+    job_key = models.CharField(max_length=64)
+    interview = models.ForeignKey(Interview, on_delete=models.CASCADE, related_name='fit_scores')
+    match_score = models.FloatField()
+    fit = models.JSONField()  # strengths, gaps and summary returned by the model
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job_key', 'interview'], name='unique_fit_per_job'),
+        ]
+
+    def __str__(self):
+        return f"Fit of interview {self.interview_id} for {self.job_key[:12]}"
+
+class CandidateEmbedding(models.Model):
+    """Embedding of a completed interview's candidate profile, used to pre-filter job matching"""
+    interview = models.OneToOneField(Interview, on_delete=models.CASCADE, related_name='embedding')
+    model_name = models.CharField(max_length=100, db_index=True)  # vectors from different models don't mix
+    dim = models.IntegerField()
+    vector = models.BinaryField()  # float32, unit length
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"Embedding of interview {self.interview_id} ({self.model_name})"
+
 class HRUser(models.Model):
     email = models.EmailField(unique=True)
     password = models.CharField(max_length=128)  # Store hashed in production!
@@ -0,0 +1,86 @@
+from django.conf import settings
+from .voice_activity import decode_audio, speech_bounds
+import io
+import shutil
+import subprocess
+import wave
+import numpy as np
+
+
+def prepare_audio(audio, sample_rate, audio_format):
+    """
+    Turn an uploaded answer into the smallest clip the transcriber needs:
+    decoded, cut to the detected speech, downmixed to mono, resampled to
+    sample_rate and encoded as audio_format ('opus' or 'wav'). Everything
+    happens in memory.
+
+    Args:
+        audio: Seekable binary file, e.g. an uploaded file
+
+    Returns:
+        A binary file with the prepared clip, the original audio (rewound)
+        when it can't be decoded here, or None when it holds no speech
+    """
+    audio.seek(0)
+    if not audio.read(1):
+        # Nothing was recorded
+        return None
+    decoded = decode_audio(audio)
+    if decoded is None:
+        audio.seek(0)
+        return audio
+    samples, rate = decoded
+    if settings.VAD_ENABLED:
+        bounds = speech_bounds(samples, rate)
+        if bounds is None:
+            return None
+        samples = samples[int(bounds[0] * rate):int(bounds[1] * rate)]
+    samples = resample(samples, rate, sample_rate)
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+    if audio_format == 'opus':
+        try:
+            return _encode_opus(pcm, sample_rate)
+        except Exception as e:
+            # Still mono and resampled, just uncompressed
+            print(f"Could not encode opus, sending wav: {str(e)}")
+    return _write_wav(pcm, sample_rate)
+
+
+def resample(samples, rate, target_rate):
+    """Resample mono samples, low-pass filtering first when downsampling"""
+    if rate == target_rate or len(samples) == 0:
+        return samples
+    if rate > target_rate:
+        # Moving average over one output sample period keeps most aliasing out
+        width = int(round(rate / target_rate))
+        if width > 1:
+            samples = np.convolve(samples, np.full(width, 1.0 / width, dtype=np.float32), mode='same')
+    count = int(len(samples) * target_rate / rate)
+    positions = np.arange(count, dtype=np.float64) * (rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _write_wav(pcm, sample_rate):
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as target:
+        target.setnchannels(1)
+        target.setsampwidth(2)
+        target.setframerate(sample_rate)
+        target.writeframes(pcm)
+    output.seek(0)
+    return output
+
+
+def _encode_opus(pcm, sample_rate):
+    ffmpeg = shutil.which(settings.FFMPEG_BINARY)
+    if ffmpeg is None:
+        raise Exception(f"{settings.FFMPEG_BINARY} not found, set FFMPEG_BINARY or install ffmpeg")
+    result = subprocess.run(
+        [ffmpeg, '-v', 'error', '-nostdin',
+         '-f', 's16le', '-ar', str(sample_rate), '-ac', '1', '-i', 'pipe:0',
+         '-c:a', 'libopus', '-b:a', settings.STT_OPUS_BITRATE, '-application', 'voip', '-f', 'ogg', 'pipe:1'],
+        input=pcm, capture_output=True, timeout=30
+    )
+    if result.returncode != 0:
+        raise Exception(result.stderr.decode('utf-8', 'replace').strip())
+    return io.BytesIO(result.stdout)
@@ -0,0 +1,70 @@
+from django.conf import settings
+import hashlib
+import os
+import re
+import threading
+import time
+
+_BLOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+_purge_lock = threading.Lock()
+_last_purge = 0.0
+
+
+def _blob_path(blob_id):
+    return os.path.join(settings.AUDIO_BLOB_DIR, f"{blob_id}.mp3")
+
+
+def save_audio(data):
+    """
+    Store synthesized audio as a short-lived blob.
+
+    Blobs are content-addressed, so identical audio maps to the same id and
+    can be cached by the client.
+
+    Returns:
+        The blob id
+    """
+    blob_id = hashlib.sha256(data).hexdigest()[:32]
+    os.makedirs(settings.AUDIO_BLOB_DIR, exist_ok=True)
+    path = _blob_path(blob_id)
+    if os.path.exists(path):
+        # Refresh the expiry of an existing blob instead of rewriting it
+        os.utime(path)
+    else:
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as blob_file:
+            blob_file.write(data)
+        os.replace(temp_path, path)
+    _purge_expired()
+    return blob_id
+
+
+def get_audio_path(blob_id):
+    """Path of a stored blob, or None if the id is invalid, unknown or expired"""
+    if not _BLOB_ID_RE.match(blob_id):
+        return None
+    path = _blob_path(blob_id)
+    try:
+        if time.time() - os.path.getmtime(path) > settings.AUDIO_BLOB_TTL:
+            return None
+    except OSError:
+        return None
+    return path
+
+
+def _purge_expired():
+    # At most one sweep per minute per process
+    global _last_purge
+    now = time.time()
+    if now - _last_purge < 60 or not _purge_lock.acquire(blocking=False):
+        return
+    try:
+        _last_purge = now
+        for entry in os.scandir(settings.AUDIO_BLOB_DIR):
+            try:
+                if now - entry.stat().st_mtime > settings.AUDIO_BLOB_TTL:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+    finally:
+        _purge_lock.release()
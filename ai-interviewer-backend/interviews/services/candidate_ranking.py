@@ -0,0 +1,40 @@
+from ..models import CandidateFitScore
+import hashlib
+
+# Bump when the fit scoring prompt changes so earlier scores are not reused
+FIT_PROMPT_VERSION = 1
+
+
+def job_key(job_title, job_description, model_id):
+    """Hash of a job requirement plus everything that shapes the fit scores"""
+    # Reformatting or re-pasting the same description should hit the same scores
+    normalized = " ".join(f"{job_title}\n{job_description}".split()).lower()
+    return hashlib.sha256(
+        f"{normalized}|prompt:{FIT_PROMPT_VERSION}|model:{model_id}".encode('utf-8')
+    ).hexdigest()
+
+
+def get_cached_fits(key, interview_ids):
+    """
+    Previously computed fit scores for these interviews.
+
+    Returns:
+        Dict of interview id -> fit dict (match_score, strengths, gaps, summary)
+    """
+    rows = CandidateFitScore.objects.filter(
+        job_key=key,
+        interview_id__in=interview_ids
+    ).values_list('interview_id', 'match_score', 'fit')
+    return {interview_id: {**fit, 'match_score': score} for interview_id, score, fit in rows}
+
+
+def store_fits(key, fits):
+    """Save freshly computed fit scores, given as a dict of interview id -> fit dict"""
+    CandidateFitScore.objects.bulk_create([
+        CandidateFitScore(
+            job_key=key,
+            interview_id=interview_id,
+            match_score=fit['match_score'],
+            fit={k: v for k, v in fit.items() if k != 'match_score'}
+        ) for interview_id, fit in fits.items()
+    ], ignore_conflicts=True)  # a concurrent request may have scored the same candidate
@@ -0,0 +1,241 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .prompt_builder import PromptBuilder, count_tokens, truncate_to_tokens
+from .tasks import enqueue_transcript_summary
+from ..models import ConversationState, TranscriptEntry
+import collections
+import threading
+
+
+class ConversationMemory:
+    """
+    Per-interview conversation memory that survives across requests.
+
+    The rolling context lives in the ConversationState table, trimmed to
+    max_tokens, with an in-process LRU in front of it. A cached entry is
+    only used while its version and write time still match the row, so
+    workers never serve each other's stale history, not even for an id
+    reused after the tables were emptied.
+    """
+
+    def __init__(self, max_tokens, cache_size):
+        self.max_tokens = max_tokens
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def recent(self, interview_id, count=None, pending=()):
+        """
+        Most recent {speaker, text, sequence} messages, oldest first.
+
+        Args:
+            pending: messages of the current turn that are not saved yet
+        """
+        messages = self._load(interview_id)['messages'] + list(pending)
+        return list(messages if count is None else messages[-count:])
+
+    def context(self, interview_id, pending=()):
+        """Rolling context formatted for a prompt, prefixed by the summary of earlier turns"""
+        state = self._load(interview_id)
+        messages = state['messages'] + list(pending)
+        if not messages:
+            return "No previous conversation."
+        context = "\n".join(f"{m['speaker'].upper()}: {m['text']}" for m in messages)
+        if state['summary']:
+            context = f"EARLIER IN THE INTERVIEW (summary): {state['summary']}\n{context}"
+        return context
+
+    def transcript_for_prompt(self, interview_id):
+        """
+        Whole-interview transcript for a prompt: the cached summary plus the
+        entries it does not cover yet, instead of every entry verbatim.
+        """
+        state = ConversationState.objects.filter(
+            interview_id=interview_id
+        ).values('summary', 'summary_upto').first() or {'summary': '', 'summary_upto': 0}
+        entries = TranscriptEntry.objects.filter(
+            interview_id=interview_id,
+            sequence__gt=state['summary_upto']
+        ).order_by('sequence').values('speaker', 'text')
+        transcript = "\n".join(f"{e['speaker'].upper()}: {e['text']}" for e in entries)
+        if state['summary']:
+            return f"SUMMARY OF EARLIER CONVERSATION:\n{state['summary']}\n\nLATER CONVERSATION:\n{transcript}"
+        return transcript or "No conversation recorded."
+
+    def append(self, interview_id, speaker, text, sequence=None):
+        """Add an utterance and persist the trimmed window"""
+        self.extend(interview_id, [{'speaker': speaker, 'text': text, 'sequence': sequence}])
+
+    def extend(self, interview_id, new_messages):
+        """Add several {speaker, text, sequence} messages with a single write"""
+        for _ in range(3):
+            state = self._load(interview_id)
+            messages = state['messages'] + list(new_messages)
+            messages, token_count = self._trim(messages)
+            new_state = dict(
+                state, messages=messages, token_count=token_count,
+                version=state['version'] + 1, updated_at=timezone.now()
+            )
+            if self._save(interview_id, state['version'], new_state):
+                self._remember(interview_id, new_state)
+                self._maybe_summarize(interview_id, new_state)
+                return
+            # Another request wrote in between; reload and try again
+            self._forget(interview_id)
+        print(f"Conversation memory for interview {interview_id} not updated after concurrent writes")
+
+    def summarize(self, interview_id, llm):
+        """
+        Fold transcript entries that have left the window into the running summary.
+
+        Returns:
+            True if the summary was extended
+        """
+        state = ConversationState.objects.filter(
+            interview_id=interview_id
+        ).values('messages', 'summary', 'summary_upto').first()
+        window_start = self._window_start(state['messages']) if state else None
+        if window_start is None:
+            return False
+        entries = list(TranscriptEntry.objects.filter(
+            interview_id=interview_id,
+            sequence__gt=state['summary_upto'],
+            sequence__lt=window_start
+        ).order_by('sequence').values('sequence', 'speaker', 'text'))
+        if not entries:
+            return False
+        segment = "\n".join(f"{e['speaker'].upper()}: {e['text']}" for e in entries)
+        builder = PromptBuilder()
+        builder.add(
+            "You are keeping notes on an ongoing Excel technical interview. "
+            "Update the summary below with the new part of the conversation.",
+            priority=10
+        )
+        builder.add(f"SUMMARY SO FAR:\n{state['summary'] or 'Nothing yet.'}", priority=5, min_tokens=settings.SUMMARY_MAX_TOKENS)
+        builder.add(f"NEW CONVERSATION:\n{segment}", priority=1, min_tokens=200, keep='tail')
+        builder.add(
+            f"Write the updated summary in under {settings.SUMMARY_MAX_TOKENS * 3 // 4} words. Keep the candidate's "
+            "background, every question asked, how well each was answered and anything notable. "
+            "Return only the summary.",
+            priority=10
+        )
+        prompt = builder.build()
+        response = llm.invoke(prompt)
+        summary = response.content if hasattr(response, "content") else str(response)
+        summary = truncate_to_tokens(summary.strip(), settings.SUMMARY_MAX_TOKENS)
+        # Conditional on summary_upto so a concurrent run can't fold the same segment twice
+        updated = ConversationState.objects.filter(
+            interview_id=interview_id,
+            summary_upto=state['summary_upto']
+        ).update(
+            summary=summary,
+            summary_upto=entries[-1]['sequence'],
+            version=F('version') + 1,
+            updated_at=timezone.now()
+        )
+        return updated == 1
+
+    def _maybe_summarize(self, interview_id, state):
+        window_start = self._window_start(state['messages'])
+        if window_start is None:
+            return
+        if window_start - 1 - state['summary_upto'] >= settings.SUMMARY_SEGMENT_ENTRIES:
+            enqueue_transcript_summary(interview_id)
+
+    @staticmethod
+    def _window_start(messages):
+        # Sequence of the oldest message still in the window (None for legacy messages)
+        return messages[0].get('sequence') if messages else None
+
+    def _trim(self, messages):
+        token_count = sum(count_tokens(m['text']) for m in messages)
+        # Always keep the latest message, even if it alone exceeds the budget
+        while token_count > self.max_tokens and len(messages) > 1:
+            token_count -= count_tokens(messages.pop(0)['text'])
+        return messages, token_count
+
+    def _load(self, interview_id):
+        with self._lock:
+            cached = self._cache.get(interview_id)
+        row = ConversationState.objects.filter(interview_id=interview_id)
+        if cached is not None:
+            if row.values_list('version', 'updated_at').first() == (cached['version'], cached['updated_at']):
+                with self._lock:
+                    if interview_id in self._cache:
+                        self._cache.move_to_end(interview_id)
+                return cached
+        state = row.values('messages', 'token_count', 'version', 'updated_at', 'summary', 'summary_upto').first()
+        if state is None:
+            state = self._backfill(interview_id)
+        self._remember(interview_id, state)
+        return state
+
+    def _backfill(self, interview_id):
+        # Interviews that predate the memory table: seed from the latest transcript rows
+        entries = TranscriptEntry.objects.filter(
+            interview_id=interview_id
+        ).order_by('-sequence').values('speaker', 'text', 'sequence')[:50]
+        messages, token_count = self._trim([dict(e) for e in reversed(list(entries))])
+        return {
+            'messages': messages, 'token_count': token_count, 'version': 0,
+            'updated_at': None, 'summary': '', 'summary_upto': 0
+        }
+
+    def _save(self, interview_id, expected_version, state):
+        # The summary columns belong to the summarize job and are never written here
+        window = {key: state[key] for key in ('messages', 'token_count', 'version', 'updated_at')}
+        if expected_version > 0:
+            updated = ConversationState.objects.filter(
+                interview_id=interview_id,
+                version=expected_version
+            ).update(**window)
+            return updated == 1
+        try:
+            # Savepoint so a lost creation race doesn't break an enclosing transaction
+            with transaction.atomic():
+                created = ConversationState.objects.create(interview_id=interview_id, **window)
+            # auto_now picks its own timestamp on insert
+            state['updated_at'] = created.updated_at
+            return True
+        except IntegrityError:
+            return False
+
+    def _remember(self, interview_id, state):
+        # Inside a transaction, wait for the commit: a rollback must not leave
+        # a version in the cache that the table never got
+        transaction.on_commit(lambda: self._store(interview_id, state))
+
+    def _store(self, interview_id, state):
+        with self._lock:
+            self._cache[interview_id] = state
+            self._cache.move_to_end(interview_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _forget(self, interview_id):
+        with self._lock:
+            self._cache.pop(interview_id, None)
+
+    def clear(self):
+        """Drop every cached conversation, e.g. after the tables were emptied"""
+        with self._lock:
+            self._cache.clear()
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_conversation_memory():
+    """Process-wide ConversationMemory configured from settings"""
+    global _memory
+    if _memory is None:
+        with _memory_lock:
+            if _memory is None:
+                _memory = ConversationMemory(
+                    settings.CONVERSATION_MEMORY_TOKENS,
+                    settings.CONVERSATION_CACHE_SIZE
+                )
+    return _memory
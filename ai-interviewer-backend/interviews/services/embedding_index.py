@@ -0,0 +1,196 @@
+from django.conf import settings
+from ..models import CandidateEmbedding
+import hashlib
+import re
+import threading
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-z0-9+#.]+")
+
+
+class HashingEmbedder:
+    """
+    Deterministic bag-of-words embedding (feature hashing of words and word
+    pairs). Needs no model download, so it doubles as the test backend.
+    """
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD_RE.findall(text.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+                value = int.from_bytes(digest, 'little')
+                # Signed hashing keeps collisions from always adding up
+                vectors[row, value % self.dim] += 1.0 if value >> 63 else -1.0
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """Local CPU sentence-transformers model, loaded once per process"""
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.name = model_name
+
+    def encode(self, texts):
+        vectors = self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def candidate_text(resume_analysis, detailed_report):
+    """Text describing a candidate: resume skills and experience plus the interview report"""
+    resume = resume_analysis or {}
+    report = detailed_report or {}
+    parts = [
+        " ".join(str(skill) for skill in resume.get('skills') or []),
+        str(resume.get('experience') or ''),
+        f"Excel proficiency: {resume.get('excel_proficiency') or 'Unknown'}",
+        str(report.get('detailed_analysis') or '')[:4000]
+    ]
+    return "\n".join(part for part in parts if part)
+
+
+class CandidateIndex:
+    """
+    In-memory matrix of candidate embeddings for nearest-neighbour search.
+
+    Vectors are persisted in CandidateEmbedding; the matrix is loaded once
+    and then synced incrementally, so embeddings added by other workers
+    show up on the next search.
+    """
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self._ids = []
+        self._positions = {}
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._synced_at = None
+        self._lock = threading.Lock()
+
+    def index_interview(self, interview):
+        """Embed a completed interview and store the vector"""
+        text = candidate_text(interview.candidate.resume_analysis, interview.detailed_report)
+        vector = self.embedder.encode([text])[0]
+        CandidateEmbedding.objects.update_or_create(
+            interview=interview,
+            defaults={
+                'model_name': self.embedder.name,
+                'dim': vector.shape[0],
+                'vector': vector.tobytes()
+            }
+        )
+        with self._lock:
+            self._put(interview.id, vector)
+
+    def index_missing(self, interviews):
+        """Embed the interviews in a queryset that have no vector for the current model yet"""
+        missing = interviews.exclude(
+            embedding__model_name=self.embedder.name
+        ).select_related('candidate').only('id', 'detailed_report', 'candidate__resume_analysis')
+        for interview in missing:
+            self.index_interview(interview)
+
+    def nearest(self, query_text, k):
+        """
+        Interview ids of the k candidates most similar to query_text.
+
+        Returns:
+            List of (interview_id, cosine similarity), best first
+        """
+        self._sync()
+        query = self.embedder.encode([query_text])[0]
+        with self._lock:
+            if not self._ids:
+                return []
+            scores = self._matrix[:len(self._ids)] @ query
+            ids = list(self._ids)
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+    def clear(self):
+        """Forget every loaded vector, e.g. after the embeddings table was emptied"""
+        with self._lock:
+            self._ids, self._positions, self._synced_at = [], {}, None
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def _sync(self):
+        rows = CandidateEmbedding.objects.filter(model_name=self.embedder.name)
+        stored = set(rows.values_list('interview_id', flat=True))
+        with self._lock:
+            synced_at = self._synced_at
+            # Embeddings were deleted or re-embedded elsewhere, even if as many
+            # were added since: rebuild from scratch
+            if not stored.issuperset(self._positions):
+                self._ids, self._positions, synced_at = [], {}, None
+        if synced_at is not None:
+            # Inclusive, so a row saved within the same timestamp is not missed
+            rows = rows.filter(updated_at__gte=synced_at)
+        latest = synced_at
+        for interview_id, vector, updated_at in rows.values_list('interview_id', 'vector', 'updated_at').iterator():
+            with self._lock:
+                self._put(interview_id, np.frombuffer(vector, dtype=np.float32))
+            latest = updated_at if latest is None else max(latest, updated_at)
+        with self._lock:
+            self._synced_at = latest
+
+    def _put(self, interview_id, vector):
+        position = self._positions.get(interview_id)
+        if position is None:
+            position = len(self._ids)
+            if position >= self._matrix.shape[0] or self._matrix.shape[1] != vector.shape[0]:
+                # Grow geometrically so incremental adds stay amortised O(1)
+                grown = np.zeros((max(64, position * 2), vector.shape[0]), dtype=np.float32)
+                if self._matrix.shape[1] == vector.shape[0]:
+                    grown[:position] = self._matrix[:position]
+                self._matrix = grown
+            self._ids.append(interview_id)
+            self._positions[interview_id] = position
+        self._matrix[position] = vector
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_embedder():
+    """Embedding backend from settings.EMBEDDING_BACKEND: 'auto', 'sentence-transformers' or 'hashing'"""
+    backend = settings.EMBEDDING_BACKEND
+    if backend != 'hashing':
+        try:
+            return SentenceTransformerEmbedder(settings.EMBEDDING_MODEL)
+        except Exception as e:
+            # A missing package, but also a model that can't be downloaded or loaded
+            if backend == 'sentence-transformers':
+                raise
+            print(f"Could not load sentence-transformers model, using hashing embeddings: {str(e)}")
+    return HashingEmbedder(settings.EMBEDDING_DIM)
+
+
+def get_candidate_index():
+    """Process-wide candidate index"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CandidateIndex(get_embedder())
+    return _index
+
+
+def clear_candidate_index():
+    """Empty the process-wide index if one was loaded, without loading the embedder"""
+    if _index is not None:
+        _index.clear()
@@ -1,10 +1,17 @@
-from langchain.memory import ConversationBufferMemory
-from langchain_aws import ChatBedrock
-from ..models import Interview, Candidate, InterviewQuestion
-from django.db import models
+from .llm_pool import get_llm
+from .candidate_ranking import job_key, get_cached_fits, store_fits
+from .embedding_index import get_candidate_index
+from .conversation_memory import get_conversation_memory
+from .prompt_builder import PromptBuilder, count_tokens, truncate_to_tokens
+from .tasks import enqueue_answer_scoring, enqueue_interview_report
+from ..models import Interview, Candidate, InterviewQuestion, TranscriptEntry
+from django.db import models, transaction
 from django.conf import settings
-import boto3
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import datetime
+import time
 import os 
 import json 
  # Check if response is wrapped in code blocks
@@ -14,32 +21,75 @@ os.environ["AWS_ACCESS_KEY_ID"] = settings.AWS_ACCESS_KEY_ID
 os.environ["AWS_SECRET_ACCESS_KEY"] = settings.AWS_SECRET_ACCESS_KEY
 os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
 
+# Fixed interviewer phrases (pre-rendered by the warm_tts_cache command)
+SILENCE_REMINDER = "I didn't hear your response. Could you please answer the question, or let me know if you need me to repeat or clarify anything?"
+
+
+
+def excerpt_tokens():
+    """Longest resume or answer excerpt embedded in a single turn prompt: a fifth of PROMPT_TOKEN_BUDGET"""
+    return settings.PROMPT_TOKEN_BUDGET // 5
+
+
+class ResumeAnalysisPending(Exception):
+    """Raised when the candidate's background resume analysis has not finished yet"""
+
+    def __init__(self, analysis_status):
+        super().__init__(f"Resume analysis is still {analysis_status.lower()}")
+        self.analysis_status = analysis_status
+
+
+class _Turn:
+    """
+    Changes made by one conversational turn, held in memory while the model
+    runs and written together afterwards. A failed model call leaves the
+    interview exactly as it was.
+    """
 
-class InterviewService:
     def __init__(self):
-        self.llm = ChatBedrock(
-            model_id="amazon.titan-text-premier-v1:0"
-            # model_id="anthropic.claude-3-sonnet-20240229-v1:0"
-        )
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
-        # Initialize Polly for voice
-        self.polly = boto3.client(
-        service_name='polly',
-        region_name=settings.AWS_DEFAULT_REGION,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-    )
+        self.transcript = []  # {speaker, text} messages in order
+        self.interview_fields = {'last_interaction'}
+        self.answered_question = None
+        self.new_question = None
+        self.jobs = []  # background work to enqueue with the writes
+
+    def say(self, speaker, text):
+        self.transcript.append({'speaker': speaker, 'text': text})
+
+
+class InterviewService:
+    def __init__(self, on_token=None):
+        # Optional callback receiving candidate-facing text as it is generated
+        self.on_token = on_token
+        # Shared process-wide client, see llm_pool
+        self.model_id = "amazon.titan-text-premier-v1:0"
+        self.llm = get_llm(self.model_id)
+        # self.llm = get_llm("anthropic.claude-3-sonnet-20240229-v1:0")
+        # Durable per-interview rolling context shared across requests
+        self.memory = get_conversation_memory()
 
     
 
 
+    # Turn logic is written once, as generators that yield each prompt and
+    # receive its completion: _run drives them synchronously, _arun from async
+    # views, where model calls are awaited instead of holding a thread.
+
     def start_interview(self, candidate_id):
         """Start a new interview session or resume an existing one"""
+        return self._run(self._start_steps(candidate_id))
+
+    async def astart_interview(self, candidate_id):
+        """Async version of start_interview"""
+        # Waited for here, on the event loop: the steps run in the thread every
+        # async ORM call shares, so they must not sleep
+        await self._await_resume_analysis(candidate_id)
+        return await self._arun(self._start_steps(candidate_id, wait_seconds=0))
+
+    def _start_steps(self, candidate_id, wait_seconds=None):
         try:
             candidate = Candidate.objects.get(id=candidate_id)
+            self._wait_for_resume_analysis(candidate, wait_seconds)
             # Check if there's an existing incomplete interview
             existing_interview = Interview.objects.filter(
                 candidate=candidate,
@@ -47,7 +97,8 @@ class InterviewService:
             ).first()
             if existing_interview:
                 # Resume existing interview
-                greeting_prompt = f"""
+                builder = PromptBuilder()
+                builder.add(f"""
                 You are Anjali from Coding Ninjas resuming an Excel technical interview.
                 We were in the middle of an interview that was interrupted. The candidate is returning to continue.
                 Current question number: {existing_interview.current_question}
@@ -58,14 +109,17 @@ class InterviewService:
                 4. Either repeat the last question OR move to a new question if appropriate
                 Do not reintroduce yourself or restart the interview process.
                 Be natural and conversational in your response.
-                """
+                """, priority=10)
                 # Get the last exchange if available
-                if existing_interview.transcript and len(existing_interview.transcript) >= 2:
-                    last_question = existing_interview.transcript[-2]["text"] if existing_interview.transcript[-2]["speaker"] == "interviewer" else None
+                last_exchange = self.memory.recent(existing_interview.id, 2)
+                if len(last_exchange) >= 2:
+                    last_question = last_exchange[0]["text"] if last_exchange[0]["speaker"] == "interviewer" else None
                     if last_question:
-                        greeting_prompt += f"\n\nThe last question asked was: '{last_question}'"
-                response = self.llm.invoke(greeting_prompt)
-                response_text = response.content if hasattr(response, "content") else str(response)
+                        builder.add(
+                            f"\nThe last question asked was: '{truncate_to_tokens(last_question, excerpt_tokens())}'",
+                            priority=1, min_tokens=0
+                        )
+                response_text = yield builder.build()
                 self._update_transcript(existing_interview, "interviewer", response_text)
                 return {
                     'interview_id': existing_interview.id,
@@ -74,17 +128,16 @@ class InterviewService:
                 }
             else:
                 # Start new interview (original code)
-                interview = Interview.objects.create(
-                    candidate=candidate,
-                    status='ACTIVE',
-                    current_question=0
-                )
                 resume_context = candidate.resume_analysis
-                greeting_prompt = f"""
-                You are an advanced AI technical interviewer representing Coding Ninjas. Your name is Anjali, and you need to introduce both yourself and mention that your colleague Kuldeep Naruka will be present during the interview.
-
-                Resume Context: {resume_context['raw_text']}
-
+                # The instructions always fit; the resume gives way
+                builder = PromptBuilder()
+                builder.add("""
+                You are an advanced AI technical interviewer representing Coding Ninjas. Your name is Anjali, and you need to introduce both yourself and mention that your colleague Kuldeep Naruka will be present during the interview.""", priority=10)
+                builder.add(
+                    f"\n                Resume Context: {truncate_to_tokens(resume_context['raw_text'], excerpt_tokens())}",
+                    priority=1, min_tokens=0
+                )
+                builder.add("""
                 Begin with a professional greeting that:
                 1. Introduces yourself as Anjali from Coding Ninjas
                 2. Explicitly mentions that your colleague Kuldeep Naruka will be present and listening during the interview
@@ -100,63 +153,183 @@ class InterviewService:
                 - Sound natural and conversational, not robotic
                 - Do not mention that you are an AI - present yourself as a human interviewer
                 - if you dont know the interview is starting, just say "Hello, I am Anjali from Coding Ninjas. My colleague Kuldeep Naruka will be present and listening to our conversation. what is your name ? can you introduce yourself?"
-                """
-                response = self.llm.invoke(greeting_prompt)
-                response_text = response.content if hasattr(response, "content") else str(response)
-                self._update_transcript(interview, "interviewer", response_text)
+                """, priority=10)
+                response_text = yield builder.build()
+                # Created only once the greeting exists, so a failed call leaves no empty interview
+                with transaction.atomic():
+                    interview = Interview.objects.create(
+                        candidate=candidate,
+                        status='ACTIVE',
+                        current_question=0
+                    )
+                    self._update_transcript(interview, "interviewer", response_text)
                 return {
                     'interview_id': interview.id,
                     'message': response_text,
                     'status': 'STARTED'
                 }
+        except ResumeAnalysisPending:
+            raise
         except Exception as e:
             raise Exception(f"Error starting interview: {str(e)}")
 
+    def _wait_for_resume_analysis(self, candidate, wait_seconds=None):
+        """
+        Give an in-flight background resume analysis a short grace period
+        (RESUME_ANALYSIS_WAIT_SECONDS unless wait_seconds is given).
+        Raises ResumeAnalysisPending if it is still not available afterwards.
+        """
+        if wait_seconds is None:
+            wait_seconds = settings.RESUME_ANALYSIS_WAIT_SECONDS
+        deadline = time.monotonic() + wait_seconds
+        while candidate.resume_analysis is None:
+            if time.monotonic() >= deadline:
+                raise ResumeAnalysisPending(candidate.analysis_status)
+            time.sleep(0.5)
+            candidate.refresh_from_db(fields=['resume_analysis', 'analysis_status'])
+
+    async def _await_resume_analysis(self, candidate_id):
+        """Async version of _wait_for_resume_analysis, sleeping on the event loop"""
+        candidate = await Candidate.objects.only(
+            'resume_analysis', 'analysis_status'
+        ).filter(id=candidate_id).afirst()
+        if candidate is None:
+            # Reported by the steps like any other start error
+            return
+        deadline = time.monotonic() + settings.RESUME_ANALYSIS_WAIT_SECONDS
+        while candidate.resume_analysis is None:
+            if time.monotonic() >= deadline:
+                raise ResumeAnalysisPending(candidate.analysis_status)
+            await asyncio.sleep(0.5)
+            await candidate.arefresh_from_db(fields=['resume_analysis', 'analysis_status'])
+
 
     def process_response(self, interview_id, user_input):
         """Process candidate's response and generate next question"""
-        interview = Interview.objects.get(id=interview_id)
-        # Add to memory
-        self.memory.save_context(
-            {"input": user_input},
-            {"output": ""}
-        )
-        # Store candidate's response
-        self._update_transcript(interview, "candidate", user_input)
-        # If this was an answer to a question, save it to the InterviewQuestion
+        return self._run(self._response_steps(interview_id, user_input))
+
+    async def aprocess_response(self, interview_id, user_input):
+        """Async version of process_response"""
+        return await self._arun(self._response_steps(interview_id, user_input))
+
+    def _response_steps(self, interview_id, user_input):
+        interview = Interview.objects.select_related('candidate').get(id=interview_id)
+        turn = _Turn()
+        turn.say("candidate", user_input)
+        # If this was an answer to a question, record it on the InterviewQuestion
         if interview.current_question > 0:
-            try:
-                question = InterviewQuestion.objects.filter(
-                    interview=interview,
-                    question_number=interview.current_question
-                ).latest('created_at')
+            question = InterviewQuestion.objects.filter(
+                interview=interview,
+                question_number=interview.current_question
+            ).only('id', 'interview_id', 'answer').order_by('-created_at').first()
+            if question is not None:
                 question.answer = user_input
-                question.save()
-            except InterviewQuestion.DoesNotExist:
-                pass
-        # Generate brief feedback and next question
-        
+                turn.answered_question = question
         # Generate next question based on interview phase
-        next_question = self._generate_next_question(interview)
-        
-        self._update_transcript(interview, "interviewer", next_question)
+        next_question = yield from self._generate_next_question(interview, turn)
+        turn.say("interviewer", next_question)
+        self._flush_turn(interview, turn)
         return {
             'message': next_question,
             'status': interview.status
         }
 
+    def _flush_turn(self, interview, turn):
+        """Write everything a turn changed in one short transaction"""
+        with transaction.atomic():
+            if turn.answered_question is not None:
+                turn.answered_question.save(update_fields=['answer'])
+            if turn.new_question is not None:
+                turn.new_question.save()
+            self._append_transcript(interview, turn.transcript)
+            interview.save(update_fields=sorted(turn.interview_fields))
+            # Jobs are dispatched once the transaction commits
+            for job in turn.jobs:
+                job()
+
+    def _run(self, steps):
+        """Drive turn steps, answering each prompt they yield with a completion"""
+        done, value = _advance(steps)
+        while not done:
+            try:
+                completion = self._complete(value)
+            except Exception as e:
+                # Raised inside the steps so their own error handling applies
+                done, value = _advance(steps, error=e)
+            else:
+                done, value = _advance(steps, completion)
+        return value
+
+    async def _arun(self, steps):
+        """
+        Drive turn steps from async code: the database work between prompts
+        runs in a worker thread and completions are awaited on the event loop.
+        """
+        advance = sync_to_async(_advance)
+        done, value = await advance(steps)
+        while not done:
+            try:
+                completion = await self._acomplete(value)
+            except Exception as e:
+                done, value = await advance(steps, error=e)
+            else:
+                done, value = await advance(steps, completion)
+        return value
+
+    def _complete(self, prompt):
+        """
+        Run a candidate-facing completion. When an on_token callback is set the
+        model output is streamed through it chunk by chunk. Prompts arrive
+        within budget: their variable parts are bounded where they are built.
+        """
+        if self.on_token is None:
+            response = self.llm.invoke(prompt)
+            return response.content if hasattr(response, "content") else str(response)
+        parts = []
+        for chunk in self.llm.stream(prompt):
+            text = chunk.content if hasattr(chunk, "content") else str(chunk)
+            if text:
+                parts.append(text)
+                self.on_token(text)
+        return "".join(parts)
+
+    async def _acomplete(self, prompt):
+        """Async version of _complete"""
+        if self.on_token is None:
+            response = await self.llm.ainvoke(prompt)
+            return response.content if hasattr(response, "content") else str(response)
+        parts = []
+        async for chunk in self.llm.astream(prompt):
+            text = chunk.content if hasattr(chunk, "content") else str(chunk)
+            if text:
+                parts.append(text)
+                self.on_token(text)
+        return "".join(parts)
+
     def _update_transcript(self, interview, speaker, text):
-        """Update the interview transcript"""
-        if not interview.transcript:
-            interview.transcript = []
-        interview.transcript.append({
-            "speaker": speaker,
-            "text": text,
-            "timestamp": datetime.datetime.now().isoformat()
-        })
-        interview.save()
-
-    def _generate_next_question(self, interview):
+        """Append an entry to the interview transcript and conversation memory"""
+        with transaction.atomic():
+            self._append_transcript(interview, [{'speaker': speaker, 'text': text}])
+            interview.save(update_fields=['last_interaction'])
+
+    def _append_transcript(self, interview, messages):
+        """
+        Insert transcript entries after the latest one and add them to
+        conversation memory. Call inside a transaction: the interview row is
+        locked until commit, so concurrent appends take turns instead of
+        claiming the same sequence numbers.
+        """
+        Interview.objects.select_for_update().filter(id=interview.id).values_list('id', flat=True).first()
+        # Constant cost per turn: one indexed lookup and one insert, never a rewrite
+        last_sequence = interview.transcript_entries.aggregate(models.Max('sequence'))['sequence__max'] or 0
+        messages = [dict(m, sequence=last_sequence + i) for i, m in enumerate(messages, start=1)]
+        self.memory.extend(interview.id, messages)
+        TranscriptEntry.objects.bulk_create([
+            TranscriptEntry(interview=interview, sequence=m['sequence'], speaker=m['speaker'], text=m['text'])
+            for m in messages
+        ])
+
+    def _generate_next_question(self, interview, turn):
         """
         Generate next question based on context and phase.
         Interview flow:
@@ -168,40 +341,42 @@ class InterviewService:
         5: excel question #3
         6+: final feedback
         """
-        context = self.memory.load_memory_variables({})
         current_question = interview.current_question
         if current_question < 2:  # 0,1
             # Resume-based questions phase
-            return self._generate_resume_question(interview)
+            return (yield from self._generate_resume_question(interview, turn))
         elif current_question < 5:  # 2,3,4
             # Excel questions phase
-            return self._generate_excel_question(interview)
+            return (yield from self._generate_excel_question(interview, turn))
         else:  # 5 and above
             # Complete interview
-            return self._generate_final_feedback(interview)
+            return (yield from self._generate_final_feedback(interview, turn))
 
-    def _generate_resume_question(self, interview):
+    def _generate_resume_question(self, interview, turn):
         """Generate a question based on candidate's resume"""
         candidate = interview.candidate
         resume_data = candidate.resume_analysis
-        # Increment question counter
+        # Increment question counter (saved with the rest of the turn)
         interview.current_question += 1
-        interview.save()
+        turn.interview_fields.add('current_question')
         # Get previous response if this is question 2
         previous_response = None
         if interview.current_question == 2:
             try:
-                prev_exchanges = interview.transcript[-2:]  # Get last question and answer
+                prev_exchanges = self.memory.recent(interview.id, 2, turn.transcript)  # Get last question and answer
                 if len(prev_exchanges) >= 2:
                     previous_response = prev_exchanges[1]["text"]  # The candidate's response
             except Exception:
                 pass
-        # Format prompt based on resume data
-        prompt = f"""
-        You are Anjali  from Coding Ninjas conducting an Excel technical interview.
-
-        Candidate's resume: {resume_data['raw_text']}
-        This is question #{interview.current_question} of the interview.
+        # Format prompt based on resume data; the instructions always fit, the resume gives way first
+        builder = PromptBuilder()
+        builder.add("""
+        You are Anjali  from Coding Ninjas conducting an Excel technical interview.""", priority=10)
+        builder.add(
+            f"\n        Candidate's resume: {truncate_to_tokens(resume_data['raw_text'], excerpt_tokens())}",
+            priority=1, min_tokens=0
+        )
+        builder.add(f"""        This is question #{interview.current_question} of the interview.
 
         GUIDELINES FOR QUESTION CREATION:
 
@@ -221,10 +396,13 @@ class InterviewService:
         - "Have you had experience with Excel"
         - "Are you familiar with Excel"
         - "Have you worked with Excel"
-        - Any variation that asks about their Excel experience directly
-
-        {"The candidate's previous response was: " + previous_response if interview.current_question == 2 else ""}
-
+        - Any variation that asks about their Excel experience directly""", priority=10)
+        if interview.current_question == 2 and previous_response:
+            builder.add(
+                f"\n        The candidate's previous response was: {truncate_to_tokens(previous_response, excerpt_tokens())}",
+                priority=5, min_tokens=0
+            )
+        builder.add("""
         QUESTION REQUIREMENTS:
         1. Make it conversational and natural, as one human interviewer to a candidate
         2. Focus on ONE clear question only
@@ -242,11 +420,10 @@ class InterviewService:
         DO NOT include any formatting instructions in your response.
         DO NOT prefix your question with labels or tags.
         Just provide the natural conversational response directly.
-        """
+        """, priority=10)
         # Generate question
-        question = self.llm.invoke(prompt)
-        question_text = question.content if hasattr(question, "content") else str(question)
-        InterviewQuestion.objects.create(
+        question_text = yield builder.build()
+        turn.new_question = InterviewQuestion(
             interview=interview,
             question_number=interview.current_question,
             question_text=question_text,
@@ -254,14 +431,14 @@ class InterviewService:
         )
         return question_text
 
-    def _generate_excel_question(self, interview):
+    def _generate_excel_question(self, interview, turn):
         """Generate an Excel-specific question with hybrid difficulty progression and adaptivity"""
-        # Load the transcript to assess performance
-        transcript = interview.transcript
+        # Load the recent conversation to assess performance
+        transcript = self.memory.recent(interview.id, pending=turn.transcript)
         candidate = interview.candidate
-        # Increment question counter
+        # Increment question counter (saved with the rest of the turn)
         interview.current_question += 1
-        interview.save()
+        turn.interview_fields.add('current_question')
         # Format prompt for Excel question based on proficiency
         excel_proficiency = candidate.resume_analysis.get('excel_proficiency', 'Intermediate')
         # Map proficiency to difficulty
@@ -296,79 +473,49 @@ class InterviewService:
         previous_response = None
         prev_question = None
         try:
-            prev_exchanges = interview.transcript[-2:]  # Get last question and answer
+            prev_exchanges = transcript[-2:]  # Get last question and answer
             if len(prev_exchanges) >= 2:
                 previous_response = prev_exchanges[1]["text"]  # The candidate's response
-                # Get the previous question
-                prev_question = InterviewQuestion.objects.filter(
-                    interview=interview,
-                    question_number=interview.current_question-1
-                ).latest('created_at')
+                # The previous question is the one answered this turn
+                prev_question = turn.answered_question
         except Exception:
             pass
 
-        # Score previous answer if one exists
+        # Score the previous answer in the background so this turn only waits on
+        # question generation. Difficulty adapts to the latest score already in.
         if previous_response and prev_question:
-            try:
-                scoring_prompt = f"""
-                You are an Excel assessment expert. Rate the following answer to an Excel technical question:
-                
-                Question: {prev_question.question_text}
-                Answer: {previous_response}
-                
-                On a scale of 1-10, provide only a number score for this answer based on these guidelines:
-                    - 1-3: Completely incorrect or nonsensical answer
-                    - 4-5: Shows basic understanding but with significant gaps or errors
-                    - 6-7: Generally correct answer with minor misunderstandings
-                    - 8-10: Technically accurate and complete answer
-
-                Be generous in your scoring when there's partial understanding.
-                Consider the complexity of the question when scoring.
-                For verbal responses, focus on conceptual understanding rather than exact syntax.
-                
-                Return only the numeric score, nothing else.
-                """
-                # Get score
-                score_response = self.llm.invoke(scoring_prompt)
-                score_text = score_response.content if hasattr(score_response, "content") else str(score_response)
-                # Extract numeric score
-                import re
-                score_match = re.search(r'\b([0-9]|10)\b', score_text)
-                if score_match:
-                    score = int(score_match.group(1))
-                    # Save score to previous question
-                    prev_question.score = score
-                    prev_question.save()
-                    # Adjust difficulty based on performance, but with limits
-                    if score < 4:
-                        prev_question.feedback = f"Your answer shows basic understanding but lacks key technical details about {prev_question.question_type.replace('excel_', '')} Excel concepts."
-
-                        # Lower difficulty but never below base_difficulty
-                        if difficulty == 'difficult':
-                            difficulty = 'moderate'
-                        elif difficulty == 'moderate' and base_difficulty == 'easy':
-                            difficulty = 'easy'
-                    elif score > 7:
-                        prev_question.feedback = f"Excellent answer that shows strong technical proficiency in {prev_question.question_type.replace('excel_', '')} Excel skills."
-                        # Push to difficult if they're excelling
-                        difficulty = 'difficult'
-                    # Print debug info
-                    elif score > 4 and score <= 7:
-                        prev_question.feedback = f"Excellent answer that shows strong technical proficiency in {prev_question.question_type.replace('excel_', '')} Excel skills."
-                    print(f"Q{excel_question_number}: Base: {base_difficulty}, Score: {score}, Final: {difficulty}")
-            except Exception as e:
-                print(f"Error scoring answer: {str(e)}")
+            turn.jobs.append(lambda: enqueue_answer_scoring(prev_question))
+        latest_scored = InterviewQuestion.objects.filter(
+            interview=interview,
+            score__isnull=False
+        ).order_by('-question_number', '-created_at').first()
+        if latest_scored:
+            score = latest_scored.score
+            # Adjust difficulty based on performance, but with limits
+            if score < 4:
+                # Lower difficulty but never below base_difficulty
+                if difficulty == 'difficult':
+                    difficulty = 'moderate'
+                elif difficulty == 'moderate' and base_difficulty == 'easy':
+                    difficulty = 'easy'
+            elif score > 7:
+                # Push to difficult if they're excelling
+                difficulty = 'difficult'
 
-        prompt = f"""
+        # The instructions around it always fit; the conversation so far gives way first
+        builder = PromptBuilder()
+        builder.add(f"""
         You are Anjali from Coding Ninjas conducting an Excel technical interview. Generate a {difficulty} level Excel question.
 
-        This is question #{interview.current_question} of the interview.
-
-        {"The candidate's previous response was: " + previous_response if previous_response else "This is your first Excel-specific question."}
-
-        For context, here's how the interview has gone so far:
-        {self._format_transcript_summary(transcript)}
-
+        This is question #{interview.current_question} of the interview.""", priority=10)
+        builder.add(
+            f"\n        The candidate's previous response was: {previous_response}" if previous_response
+            else "\n        This is your first Excel-specific question.",
+            priority=5, min_tokens=excerpt_tokens()
+        )
+        builder.add("\n        For context, here's how the interview has gone so far:", priority=10)
+        builder.add(f"        {self.memory.context(interview.id, turn.transcript)}", priority=1, min_tokens=200, keep='tail')
+        builder.add(f"""
         FEEDBACK GUIDELINES:
         - If the previous answer was technically accurate and complete, start with "That's excellent! You've demonstrated strong understanding of [concept]."
         - If the previous answer had minor issues but was mostly correct, start with "That's a good effort. You understand the basics of [concept], but..."
@@ -393,12 +540,11 @@ class InterviewService:
         DO NOT include any formatting instructions or labels in your response.
         DO NOT start your response with "QUESTION FORMAT:" or similar text.
         Just provide the natural conversational response directly.
-        """
+        """, priority=10)
         # Generate question
-        question = self.llm.invoke(prompt)
-        question_text = question.content if hasattr(question, "content") else str(question)
+        question_text = yield builder.build()
         # Record this question
-        InterviewQuestion.objects.create(
+        turn.new_question = InterviewQuestion(
             interview=interview,
             question_number=interview.current_question,
             question_text=question_text,
@@ -406,30 +552,68 @@ class InterviewService:
         )
         return question_text
         
-    def _generate_final_feedback(self, interview):
+    def score_answer(self, question):
+        """Score an answered question with the LLM and save the score and feedback"""
+        try:
+            # The instructions always fit; the answer gives way
+            builder = PromptBuilder()
+            builder.add(f"""
+            You are an Excel assessment expert. Rate the following answer to an Excel technical question:
+            
+            Question: {truncate_to_tokens(question.question_text, excerpt_tokens())}""", priority=10)
+            builder.add(
+                f"            Answer: {truncate_to_tokens(question.answer or '', excerpt_tokens())}",
+                priority=1, min_tokens=0
+            )
+            builder.add("""            
+            On a scale of 1-10, provide only a number score for this answer based on these guidelines:
+                - 1-3: Completely incorrect or nonsensical answer
+                - 4-5: Shows basic understanding but with significant gaps or errors
+                - 6-7: Generally correct answer with minor misunderstandings
+                - 8-10: Technically accurate and complete answer
+
+            Be generous in your scoring when there's partial understanding.
+            Consider the complexity of the question when scoring.
+            For verbal responses, focus on conceptual understanding rather than exact syntax.
+            
+            Return only the numeric score, nothing else.
+            """, priority=10)
+            # Get score
+            score_response = self.llm.invoke(builder.build())
+            score_text = score_response.content if hasattr(score_response, "content") else str(score_response)
+            # Extract numeric score
+            score_match = re.search(r'\b([0-9]|10)\b', score_text)
+            if not score_match:
+                return None
+            score = int(score_match.group(1))
+            question.score = score
+            if score < 4:
+                question.feedback = f"Your answer shows basic understanding but lacks key technical details about {question.question_type.replace('excel_', '')} Excel concepts."
+            elif score > 7:
+                question.feedback = f"Excellent answer that shows strong technical proficiency in {question.question_type.replace('excel_', '')} Excel skills."
+            elif score > 4 and score <= 7:
+                question.feedback = f"Excellent answer that shows strong technical proficiency in {question.question_type.replace('excel_', '')} Excel skills."
+            # Only touch the scoring columns; the turn may be writing the same row
+            question.save(update_fields=['score', 'feedback'])
+            return score
+        except Exception as e:
+            print(f"Error scoring answer: {str(e)}")
+            raise
+
+    def _generate_final_feedback(self, interview, turn):
         """Generate final feedback and complete the interview"""
-        # Update interview status
+        # Update interview status; the HR report is generated in the background
         interview.status = 'COMPLETED'
         interview.interview_complete = True  # Mark as complete
-        interview.save()
-        # Analyze the full transcript
-        transcript = interview.transcript
-        candidate = interview.candidate
+        interview.report_status = 'PENDING'
+        turn.interview_fields.update(['status', 'interview_complete', 'report_status'])
         candidate_name = None
         # Try to extract candidate name from transcript
-        for item in transcript:
-            if item['speaker'] == 'candidate' and len(item['text']) < 100:
+        for item in interview.transcript_entries.filter(speaker='candidate').order_by('sequence').only('text').iterator():
+            if len(item.text) < 100:
                 # Simple heuristic: first short response is likely their name
-                candidate_name = item['text'].strip()
+                candidate_name = item.text.strip()
                 break
-        # Generate detailed report (saved to DB, not returned to user)
-        detailed_report = self._generate_detailed_report(interview)
-        interview.detailed_report = detailed_report
-        # Calculate final score based on question scores
-        questions = InterviewQuestion.objects.filter(interview=interview)
-        if questions.exists():
-            avg_score = questions.aggregate(models.Avg('score'))['score__avg'] or 0
-            interview.final_score = avg_score
         # Format prompt for user-facing feedback
         user_feedback_prompt = f"""
         You've just completed an Excel technical interview with {candidate_name or "the candidate"}. 
@@ -448,16 +632,35 @@ class InterviewService:
         "Thank you [name] for a great interview today! I was particularly impressed with your knowledge of [specific strength]. To further enhance your Excel skills, you might want to explore more about [topic]. Our HR team will be in touch with you soon about next steps. Have a great day!"
         """
         # Generate user feedback
-        user_feedback = self.llm.invoke(user_feedback_prompt)
-        user_feedback_text = user_feedback.content if hasattr(user_feedback, "content") else str(user_feedback)
+        user_feedback_text = yield user_feedback_prompt
         # Save the feedback to the interview model
         interview.feedback = {
             'user_feedback': user_feedback_text,
             'generated_at': datetime.datetime.now().isoformat()
         }
-        interview.save()
+        turn.interview_fields.add('feedback')
+        # Detailed report and final score are produced off the request path
+        turn.jobs.append(lambda: enqueue_interview_report(interview))
         return user_feedback_text
 
+    def generate_report(self, interview):
+        """Build the detailed HR report and final score for a completed interview"""
+        # Generate detailed report (saved to DB, not returned to user)
+        interview.detailed_report = self._generate_detailed_report(interview)
+        # Calculate final score based on question scores
+        questions = InterviewQuestion.objects.filter(interview=interview)
+        if questions.exists():
+            avg_score = questions.aggregate(models.Avg('score'))['score__avg'] or 0
+            interview.final_score = avg_score
+        interview.report_status = 'READY'
+        interview.save(update_fields=['detailed_report', 'final_score', 'report_status'])
+        try:
+            # Make the candidate searchable for job matching right away
+            get_candidate_index().index_interview(interview)
+        except Exception as e:
+            print(f"Error indexing interview {interview.id}: {str(e)}")
+        return interview.detailed_report
+
     def _generate_detailed_report(self, interview):
         """Generate an extremely detailed report with scoring for each question for HR use"""
         import json
@@ -475,16 +678,19 @@ class InterviewService:
             })
         # Get resume context
         resume_context = candidate.resume_analysis
-        # Format the entire transcript for context
-        transcript_text = self._format_transcript(interview.transcript)
-        detailed_prompt = f"""
+        # Summary of earlier turns plus the recent ones, not the whole transcript verbatim
+        transcript_text = self.memory.transcript_for_prompt(interview.id)
+        # Instructions and scores always fit; the resume and transcript give way first
+        builder = PromptBuilder()
+        builder.add("""
         You are an advanced Excel technical assessment expert. Create an EXTREMELY DETAILED interview report for HR.
-        CANDIDATE INFORMATION:
-        Resume Summary: {resume_context.get('raw_text', 'No resume available')}
-        FULL INTERVIEW TRANSCRIPT:
-        {transcript_text}
-        QUESTION AND ANSWER ASSESSMENT:
-        {json.dumps(qa_pairs, indent=2)}
+        CANDIDATE INFORMATION:""", priority=10)
+        builder.add(f"        Resume Summary: {resume_context.get('raw_text', 'No resume available')}", priority=1, min_tokens=300)
+        builder.add(f"""        FULL INTERVIEW TRANSCRIPT:
+        {transcript_text}""", priority=2, min_tokens=1000, keep='tail')
+        builder.add(f"""        QUESTION AND ANSWER ASSESSMENT:
+        {json.dumps(qa_pairs, indent=2)}""", priority=5, min_tokens=1000)
+        builder.add("""
         Create an EXTREMELY COMPREHENSIVE analysis with the following sections:
         1. EXECUTIVE SUMMARY
            - Overall assessment (1-2 paragraphs)
@@ -530,7 +736,8 @@ class InterviewService:
         Be EXTREMELY detailed, providing specific examples from the interview to support each point.
         Focus on actionable insights for HR and hiring managers.
         This report will be used to make hiring decisions and for candidate feedback.
-        """
+        """, priority=10)
+        detailed_prompt = builder.build()
         # Generate the detailed analysis
         analysis = self.llm.invoke(detailed_prompt)
         analysis_text = analysis.content if hasattr(analysis, "content") else str(analysis)
@@ -556,85 +763,175 @@ class InterviewService:
         }
         return report
 
-    def _format_transcript_summary(self, transcript):
-        """Format a brief summary of the transcript for context"""
-        if not transcript:
-            return "No previous conversation."
-            
-        summary = []
-        for item in transcript[-6:]:  # Last 6 exchanges only
-            speaker = item['speaker']
-            text = item['text'][:100] + "..." if len(item['text']) > 100 else item['text']
-            summary.append(f"{speaker.upper()}: {text}")
-        
-        return "\n".join(summary)
-
-    def _format_transcript(self, transcript):
-        """Format the complete transcript"""
-        if not transcript:
-            return "No conversation recorded."
-            
-        formatted = []
-        for item in transcript:
-            formatted.append(f"{item['speaker'].upper()}: {item['text']}")
-        
-        return "\n".join(formatted)
-
-    
     def analyze_job_candidates(self, job_title, job_description, candidate_data):
         """
         Analyze candidates against job requirements.
-        
+
+        Ranking is map-reduce: every candidate is scored for fit on its own
+        (concurrently, and cached per job description and interview), then a
+        single call compares only the shortlisted candidates to pick the top 3.
+
+        This runs in the request, so the pool is capped at
+        RANKING_MAX_CANDIDATES: a cold run makes at most
+        ceil(RANKING_MAX_CANDIDATES / RANKING_MAX_PARALLEL) rounds of fit
+        calls plus the comparison. Larger pools must be narrowed first, as
+        smart_requirement_analysis does with the embedding pre-filter.
+
         Args:
             job_title: The title of the job position
             job_description: Detailed description of the job requirements
-            candidate_data: List of candidate interview data
-            
+            candidate_data: List of dicts with the interview_id of each candidate
+
         Returns:
             Analysis results and recommendations
         """
-        # Enhance candidate data with their resume information
+        if len(candidate_data) > settings.RANKING_MAX_CANDIDATES:
+            raise Exception(
+                f"Too many candidates to rank: {len(candidate_data)}, at most {settings.RANKING_MAX_CANDIDATES}"
+            )
+        enhanced_candidate_data = self._load_candidate_data(candidate_data)
+
+        # Map: fit score per candidate, reusing scores from earlier runs of the same job
+        key = job_key(job_title, job_description, self.model_id)
+        fits = get_cached_fits(key, [c['interview_id'] for c in enhanced_candidate_data])
+        unscored = [c for c in enhanced_candidate_data if c['interview_id'] not in fits]
+        if unscored:
+            scored = self._score_candidate_fits(job_title, job_description, unscored)
+            store_fits(key, {interview_id: fit for interview_id, fit in scored.items() if not fit.get('fallback')})
+            fits.update(scored)
+
+        # Reduce: compare only the best candidates side by side
+        shortlist = sorted(
+            enhanced_candidate_data,
+            key=lambda c: fits[c['interview_id']]['match_score'],
+            reverse=True
+        )[:settings.RANKING_SHORTLIST_SIZE]
+        for candidate in shortlist:
+            candidate['fit_assessment'] = fits[candidate['interview_id']]
+        return self._rank_shortlist(job_title, job_description, shortlist)
+
+    def _load_candidate_data(self, candidate_data):
+        """
+        Fill in interview, resume and per-question score data for every candidate.
+
+        Uses two queries regardless of the number of candidates, reading only
+        the columns the ranking prompts use.
+        """
+        interview_ids = [c['interview_id'] for c in candidate_data]
+        rows = Interview.objects.filter(id__in=interview_ids).values(
+            'id',
+            'final_score',
+            'candidate__email',
+            'candidate__resume_analysis',
+            'detailed_report__detailed_analysis'
+        )
+        interviews = {row['id']: row for row in rows}
+        question_scores = {}
+        for interview_id, question_type, score in InterviewQuestion.objects.filter(
+            interview_id__in=interview_ids
+        ).order_by('interview_id', 'question_number').values_list('interview_id', 'question_type', 'score'):
+            question_scores.setdefault(interview_id, []).append({'question_type': question_type, 'score': score})
+
         enhanced_candidate_data = []
-        
         for candidate in candidate_data:
-            try:
-                # Get the interview
-                interview = Interview.objects.get(id=candidate['interview_id'])
-                # Get the candidate's resume analysis
-                resume_data = interview.candidate.resume_analysis
-                
-                # Add resume data to candidate info
-                enhanced_candidate = candidate.copy()
-                enhanced_candidate['resume_data'] = resume_data
-                enhanced_candidate_data.append(enhanced_candidate)
-            except (Interview.DoesNotExist, AttributeError, KeyError) as e:
-                # If something goes wrong, just use the original data
-                enhanced_candidate_data.append(candidate)
-                print(f"Error enhancing candidate data: {e}")
-        
-        analysis_prompt = f"""
+            row = interviews.get(candidate['interview_id'])
+            if row is None:
+                print(f"Interview {candidate['interview_id']} not found, skipping candidate")
+                continue
+            enhanced_candidate_data.append({
+                'interview_id': row['id'],
+                'candidate_email': row['candidate__email'],
+                'final_score': row['final_score'],
+                'resume_data': row['candidate__resume_analysis'],
+                'detailed_report': {'detailed_analysis': row['detailed_report__detailed_analysis'] or ''},
+                'question_scores': question_scores.get(row['id'], [])
+            })
+        return enhanced_candidate_data
+
+    def _score_candidate_fits(self, job_title, job_description, candidates):
+        """Score candidates concurrently, at most RANKING_MAX_PARALLEL model calls at a time"""
+        with ThreadPoolExecutor(max_workers=settings.RANKING_MAX_PARALLEL, thread_name_prefix='fit') as executor:
+            results = executor.map(
+                lambda candidate: self._score_candidate_fit(job_title, job_description, candidate),
+                candidates
+            )
+            return {candidate['interview_id']: fit for candidate, fit in zip(candidates, results)}
+
+    def _score_candidate_fit(self, job_title, job_description, candidate):
+        """Fit of a single candidate for the job; runs in a worker thread, so no database access"""
+        prompt_head = f"""
         You are an AI talent matching specialist for a technical recruitment team.
+        Assess how well ONE candidate fits this job.
 
         JOB REQUIREMENT:
         Title: {job_title}
         Description: {job_description}
 
-        CANDIDATE DATA:
-        {json.dumps(enhanced_candidate_data)}
+        CANDIDATE DATA:"""
+        prompt_tail = """
+        Consider:
+        - Technical skills from the resume (resume_data) that match the job requirements
+        - Soft skills and problem-solving ability demonstrated in the interview (detailed_report)
+        - Excel skills as an indicator of analytical capability
+
+        FORMAT YOUR RESPONSE AS JSON:
+        {
+        "match_score": 85,
+        "strengths": ["strength1", "strength2", "strength3"],
+        "gaps": ["gap1", "gap2"],
+        "summary": "Two sentences on how the candidate's resume and interview match the job."
+        }
+        """
+        builder = PromptBuilder()
+        available = builder.budget - count_tokens(prompt_head) - count_tokens(prompt_tail)
+        builder.add(prompt_head, priority=10)
+        builder.add(f"        {json.dumps(self._compact_candidate(candidate, available))}", priority=1)
+        builder.add(prompt_tail, priority=10)
+        try:
+            response = self.llm.invoke(builder.build())
+            response_text = response.content if hasattr(response, "content") else str(response)
+            fit = self._parse_json_response(response_text)
+            return {
+                'match_score': max(0.0, min(100.0, float(fit.get('match_score', 0)))),
+                'strengths': fit.get('strengths', []),
+                'gaps': fit.get('gaps', []),
+                'summary': fit.get('summary', '')
+            }
+        except Exception as e:
+            print(f"Error scoring fit for interview {candidate.get('interview_id')}: {str(e)}")
+            # Not cached; rank by the interview score until a later run succeeds
+            return {
+                'match_score': (candidate.get('final_score') or 0) * 10,
+                'strengths': [],
+                'gaps': [],
+                'summary': "Fit could not be assessed; ranked by interview score.",
+                'fallback': True
+            }
+
+    def _rank_shortlist(self, job_title, job_description, shortlist):
+        """Pick and explain the top 3 among the shortlisted candidates"""
+        prompt_head = f"""
+        You are an AI talent matching specialist for a technical recruitment team.
+
+        JOB REQUIREMENT:
+        Title: {job_title}
+        Description: {job_description}
 
+        SHORTLISTED CANDIDATES (each with a preliminary fit_assessment):"""
+        prompt_tail = f"""
         TASK:
         1. Analyze the job requirements and thoroughly review each candidate's data including:
         - Their resume information (in resume_data field)
         - Their interview performance (detailed_report)
-        - Their responses to technical questions
-        
+        - Their preliminary fit assessment (fit_assessment)
+
         2. CREATE A BALANCED ASSESSMENT that considers:
         - Technical skills from the resume that match the job requirements
         - Soft skills and problem-solving ability demonstrated in the interview
         - Excel skills as an indicator of analytical capability
-        
+
         3. Identify the TOP 3 most suitable candidates for this position (or fewer if there aren't 3 candidates).
-        
+
         4. For each recommended candidate, provide:
         - Ranking position (1, 2, 3)
         - Candidate email
@@ -667,38 +964,97 @@ class InterviewService:
 
         Ensure your analysis gives appropriate weight to skills mentioned in the resume that directly match the job requirements, while also considering the analytical abilities demonstrated in the Excel interview.
         """
-        
+        # Every candidate gets an equal share of what the instructions leave of the budget
+        builder = PromptBuilder()
+        available = builder.budget - count_tokens(prompt_head) - count_tokens(prompt_tail)
+        per_candidate = max(50, available // max(1, len(shortlist)))
+        compact_data = [self._compact_candidate(c, per_candidate) for c in shortlist]
+        builder.add(prompt_head, priority=10)
+        builder.add(f"        {json.dumps(compact_data)}", priority=1)
+        builder.add(prompt_tail, priority=10)
+        analysis_prompt = builder.build()
+
         response = self.llm.invoke(analysis_prompt)
         response_text = response.content if hasattr(response, "content") else str(response)
-        
-        # Try to parse the response as JSON
+
         try:
-            # Check if response is wrapped in code blocks
-            import re
-            json_match = re.search(r'```(?:json)?\s*({.*?})\s*```', response_text, re.DOTALL)
-            if json_match:
-                recommendations = json.loads(json_match.group(1))
-            else:
-                recommendations = json.loads(response_text)
-            return recommendations
+            return self._parse_json_response(response_text)
         except json.JSONDecodeError:
-            # Return raw text if JSON parsing fails
+            # Fall back to the per-candidate fit scores
             return {
-                "error": "Failed to parse AI response",
+                "top_candidates": [
+                    {
+                        "rank": rank,
+                        "interview_id": c['interview_id'],
+                        "candidate_email": c.get('candidate_email'),
+                        "match_score": round(c['fit_assessment']['match_score']),
+                        "strengths": c['fit_assessment']['strengths'],
+                        "gaps": c['fit_assessment']['gaps'],
+                        "recommendation": c['fit_assessment']['summary']
+                    } for rank, c in enumerate(shortlist[:3], start=1)
+                ],
+                "analysis_summary": "Ranked by individual fit scores; the comparative analysis could not be parsed.",
                 "raw_analysis": response_text
             }
-        
+
+    def _parse_json_response(self, response_text):
+        """Parse a JSON object from a model response, unwrapping code blocks"""
+        json_match = re.search(r'```(?:json)?\s*({.*?})\s*```', response_text, re.DOTALL)
+        if json_match:
+            return json.loads(json_match.group(1))
+        return json.loads(response_text)
+
+    def _compact_candidate(self, candidate, max_tokens):
+        """Shrink a candidate's data to roughly max_tokens, trimming the free-text fields first"""
+        if count_tokens(json.dumps(candidate)) <= max_tokens:
+            return candidate
+        report = candidate.get('detailed_report') or {}
+        resume = candidate.get('resume_data') or {}
+        compact = {
+            'interview_id': candidate.get('interview_id'),
+            'candidate_email': candidate.get('candidate_email'),
+            'final_score': candidate.get('final_score'),
+            'resume_data': {key: value for key, value in resume.items() if key != 'raw_text'},
+            'question_scores': candidate.get('question_scores', [])
+        }
+        if 'fit_assessment' in candidate:
+            compact['fit_assessment'] = candidate['fit_assessment']
+        # Whatever is left goes to the report's analysis first, then the resume text
+        remaining = max(0, max_tokens - count_tokens(json.dumps(compact)))
+        compact['detailed_analysis'] = truncate_to_tokens(report.get('detailed_analysis', ''), remaining * 2 // 3)
+        compact['resume_text'] = truncate_to_tokens(
+            resume.get('raw_text', ''),
+            max(0, remaining - count_tokens(compact['detailed_analysis']))
+        )
+        return compact
 
     def handle_silence(self, interview_id):
         """Handle when no audio response is detected"""
         interview = Interview.objects.get(id=interview_id)
         
-        reminder_message = "I didn't hear your response. Could you please answer the question, or let me know if you need me to repeat or clarify anything?"
-        
         # Store in transcript
-        self._update_transcript(interview, "interviewer", reminder_message)
+        self._update_transcript(interview, "interviewer", SILENCE_REMINDER)
         
         return {
-            'message': reminder_message,
+            'message': SILENCE_REMINDER,
             'status': interview.status
-        }
\ No newline at end of file
+        }
+
+    async def ahandle_silence(self, interview_id):
+        """Async version of handle_silence"""
+        return await sync_to_async(self.handle_silence)(interview_id)
+
+
+def _advance(steps, completion=None, error=None):
+    """
+    Resume turn steps with a completion, or with the error the model call raised.
+
+    Returns:
+        (True, result) once the steps have finished, else (False, next prompt)
+    """
+    try:
+        if error is not None:
+            return False, steps.throw(error)
+        return False, steps.send(completion)
+    except StopIteration as done:
+        return True, done.value
@@ -0,0 +1,211 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from ..models import BackgroundJob
+import datetime
+import threading
+import time
+import traceback
+
+QUEUED = 'QUEUED'
+RUNNING = 'RUNNING'
+DONE = 'DONE'
+FAILED = 'FAILED'
+
+
+
+class RetryLater(Exception):
+    """
+    Raised by a handler that is not ready to run yet; requeues without using
+    up an attempt. A job still deferring JOB_QUEUE_MAX_DEFER_SECONDS after it
+    was created fails instead.
+    """
+
+    def __init__(self, reason, delay=2):
+        super().__init__(reason)
+        self.delay = delay
+
+
+_handlers = {}
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def job_handler(job_type, on_failure=None):
+    """
+    Register a function as the handler for a job type.
+
+    The handler receives the job payload dict. Raising marks the attempt as
+    failed and the job is retried with backoff until max_attempts is reached,
+    after which on_failure(payload, error) is called once.
+    """
+    def decorator(func):
+        _handlers[job_type] = (func, on_failure)
+        return func
+    return decorator
+
+
+def enqueue(job_type, payload, ref='', max_attempts=None):
+    """
+    Persist a job and hand it to the local worker pool once the surrounding
+    transaction commits.
+
+    Returns:
+        The created BackgroundJob
+    """
+    job = BackgroundJob.objects.create(
+        job_type=job_type,
+        ref=ref,
+        payload=payload,
+        max_attempts=max_attempts or settings.JOB_QUEUE_MAX_ATTEMPTS
+    )
+    transaction.on_commit(lambda: _dispatch(job.id))
+    return job
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.JOB_QUEUE_WORKERS,
+                    thread_name_prefix='job-worker'
+                )
+    return _executor
+
+
+def _dispatch(job_id, delay=0):
+    """Run the job inline (eager mode) or schedule it on the worker pool"""
+    if settings.JOB_QUEUE_EAGER:
+        # No scheduler to come back later: wait until the job is due
+        if delay > 0:
+            time.sleep(delay)
+        run_job(job_id)
+    elif delay > 0:
+        timer = threading.Timer(delay, _dispatch, args=(job_id,))
+        timer.daemon = True
+        timer.start()
+    else:
+        _get_executor().submit(_run_in_worker, job_id)
+
+
+def _run_in_worker(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def run_job(job_id):
+    """
+    Claim and execute a single queued job.
+
+    Returns:
+        True if this call ran the job, False if it was not claimable
+    """
+    now = timezone.now()
+    claimed = BackgroundJob.objects.filter(
+        id=job_id,
+        status=QUEUED,
+        run_after__lte=now
+    ).update(status=RUNNING, attempts=F('attempts') + 1, updated_at=now)
+    if not claimed:
+        return False
+
+    job = BackgroundJob.objects.get(id=job_id)
+    handler, on_failure = _handlers.get(job.job_type, (None, None))
+    try:
+        if handler is None:
+            raise Exception(f"No handler registered for job type '{job.job_type}'")
+        handler(job.payload)
+    except RetryLater as e:
+        if settings.JOB_QUEUE_EAGER and job.attempts >= job.max_attempts:
+            # Inline retries would never end, so deferrals use up attempts here
+            _fail(job, on_failure, e)
+            return True
+        if timezone.now() - job.created_at > datetime.timedelta(seconds=settings.JOB_QUEUE_MAX_DEFER_SECONDS):
+            # Whatever it waits for (e.g. a scoring job that failed) isn't coming
+            _fail(job, on_failure, e)
+            return True
+        job.status = QUEUED
+        if not settings.JOB_QUEUE_EAGER:
+            job.attempts = F('attempts') - 1
+        job.run_after = timezone.now() + datetime.timedelta(seconds=e.delay)
+        job.save(update_fields=['status', 'attempts', 'run_after', 'updated_at'])
+        _dispatch(job.id, delay=e.delay)
+        return True
+    except Exception as e:
+        print(f"Job {job.id} ({job.job_type}) attempt {job.attempts} failed: {str(e)}")
+        print(traceback.format_exc())
+        if handler is not None and job.attempts < job.max_attempts:
+            job.last_error = str(e)
+            # Eager mode has no scheduler to come back later, so retry at once
+            delay = 0 if settings.JOB_QUEUE_EAGER else settings.JOB_QUEUE_RETRY_BACKOFF * (2 ** (job.attempts - 1))
+            job.status = QUEUED
+            job.run_after = timezone.now() + datetime.timedelta(seconds=delay)
+            job.save(update_fields=['status', 'run_after', 'last_error', 'updated_at'])
+            _dispatch(job.id, delay=delay)
+        else:
+            _fail(job, on_failure, e)
+        return True
+
+    job.status = DONE
+    job.last_error = None
+    job.save(update_fields=['status', 'last_error', 'updated_at'])
+    return True
+
+
+def _fail(job, on_failure, error):
+    job.status = FAILED
+    job.last_error = str(error)
+    job.save(update_fields=['status', 'last_error', 'updated_at'])
+    if on_failure is not None:
+        on_failure(job.payload, error)
+
+
+def _requeue_stale(stale_after, now):
+    BackgroundJob.objects.filter(
+        status=RUNNING,
+        updated_at__lt=now - datetime.timedelta(seconds=stale_after)
+    ).update(status=QUEUED, updated_at=now)
+
+
+def recover_jobs(stale_after=None):
+    """
+    Hand jobs left behind by a previous process back to this one's workers:
+    the in-memory timers and pool that would have run them died with it.
+    Jobs RUNNING for over stale_after seconds (JOB_QUEUE_STALE_AFTER by
+    default) are requeued first. Other processes may dispatch the same jobs;
+    claiming in run_job makes sure each runs once.
+
+    Returns:
+        Number of jobs dispatched
+    """
+    now = timezone.now()
+    _requeue_stale(settings.JOB_QUEUE_STALE_AFTER if stale_after is None else stale_after, now)
+    jobs = list(BackgroundJob.objects.filter(status=QUEUED).values_list('id', 'run_after'))
+    for job_id, run_after in jobs:
+        _dispatch(job_id, delay=max(0.0, (run_after - now).total_seconds()))
+    return len(jobs)
+
+
+def run_pending_jobs(stale_after=None):
+    """
+    Run every due job synchronously. Jobs left RUNNING for longer than
+    stale_after seconds (e.g. by a crashed worker) are requeued first.
+
+    Returns:
+        Number of jobs executed
+    """
+    now = timezone.now()
+    if stale_after is not None:
+        _requeue_stale(stale_after, now)
+    job_ids = BackgroundJob.objects.filter(
+        status=QUEUED,
+        run_after__lte=now
+    ).order_by('run_after', 'id').values_list('id', flat=True)
+    return sum(1 for job_id in list(job_ids) if run_job(job_id))
@@ -0,0 +1,140 @@
+from langchain_aws import ChatBedrock
+from langchain_core.messages import AIMessage, AIMessageChunk
+from botocore.config import Config
+from django.conf import settings
+import boto3
+import json
+import threading
+
+
+DEFAULT_MODEL_ID = "amazon.titan-text-premier-v1:0"
+AWS_REGION = "us-east-1"
+
+_lock = threading.RLock()
+_llms = {}
+_boto_clients = {}
+_llm_factory = None
+
+
+def _cache_key(model_id, kwargs):
+    """Build a hashable registry key from a model id and its constructor kwargs"""
+    return model_id, json.dumps(kwargs, sort_keys=True, default=str)
+
+
+def get_boto_client(service_name, region_name=AWS_REGION):
+    """
+    Return a process-wide boto3 client for the given service.
+
+    boto3 clients are thread-safe, so one client (and its connection pool)
+    is shared by every request instead of being rebuilt per call.
+    """
+    key = (service_name, region_name)
+    client = _boto_clients.get(key)
+    if client is None:
+        with _lock:
+            client = _boto_clients.get(key)
+            if client is None:
+                client = boto3.client(
+                    service_name,
+                    region_name=region_name,
+                    config=Config(
+                        max_pool_connections=settings.AWS_MAX_POOL_CONNECTIONS,
+                        retries={'max_attempts': 3, 'mode': 'standard'}
+                    )
+                )
+                _boto_clients[key] = client
+    return client
+
+
+def get_llm(model_id=DEFAULT_MODEL_ID, **kwargs):
+    """
+    Return the shared chat model for (model_id, kwargs), creating it on first use.
+
+    Args:
+        model_id: Bedrock model identifier
+        **kwargs: Extra ChatBedrock arguments (e.g. model_kwargs)
+
+    Returns:
+        A chat model exposing invoke(prompt)
+    """
+    key = _cache_key(model_id, kwargs)
+    llm = _llms.get(key)
+    if llm is None:
+        with _lock:
+            llm = _llms.get(key)
+            if llm is None:
+                llm = _build_llm(model_id, kwargs)
+                _llms[key] = llm
+    return llm
+
+
+def _build_llm(model_id, kwargs):
+    if _llm_factory is not None:
+        return _llm_factory(model_id, **kwargs)
+    if settings.LLM_BACKEND == 'fake':
+        return FakeLLM(model_id, **kwargs)
+    return ChatBedrock(
+        model_id=model_id,
+        client=get_boto_client('bedrock-runtime'),
+        **kwargs
+    )
+
+
+def set_llm_factory(factory):
+    """
+    Swap the backend used to build chat models, e.g. a FakeLLM in tests.
+    Pass None to restore the configured backend. Clears cached models.
+    """
+    global _llm_factory
+    with _lock:
+        _llm_factory = factory
+        _llms.clear()
+
+
+def reset_clients():
+    """Drop every cached chat model and boto3 client"""
+    with _lock:
+        _llms.clear()
+        _boto_clients.clear()
+
+
+class FakeLLM:
+    """
+    Local stand-in for ChatBedrock that never touches the network.
+
+    responses can be a string, a list of strings (returned in turn and
+    repeating the last one), or a callable taking the prompt.
+    """
+
+    def __init__(self, model_id=DEFAULT_MODEL_ID, responses="This is a test response.", **kwargs):
+        self.model_id = model_id
+        self.kwargs = kwargs
+        self.responses = responses
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def _next_response(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+            if callable(self.responses):
+                return self.responses(prompt)
+            if isinstance(self.responses, (list, tuple)):
+                index = min(len(self.prompts), len(self.responses)) - 1
+                return self.responses[index]
+            return self.responses
+
+    def invoke(self, prompt, **kwargs):
+        return AIMessage(content=self._next_response(prompt))
+
+    def stream(self, prompt, **kwargs):
+        # Emit word-sized chunks like a streaming model would
+        text = self._next_response(prompt)
+        for index, word in enumerate(text.split(" ")):
+            yield AIMessageChunk(content=word if index == 0 else " " + word)
+
+    async def ainvoke(self, prompt, **kwargs):
+        return self.invoke(prompt, **kwargs)
+
+    async def astream(self, prompt, **kwargs):
+        for chunk in self.stream(prompt, **kwargs):
+            yield chunk
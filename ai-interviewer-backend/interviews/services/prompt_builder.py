@@ -0,0 +1,79 @@
+from django.conf import settings
+
+# Rough characters-per-token ratio for English text; deliberately conservative
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARKER = "\n[...truncated...]\n"
+
+
+def count_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def truncate_to_tokens(text, max_tokens, keep='head'):
+    """
+    Cut text down to roughly max_tokens.
+
+    Args:
+        keep: 'head' keeps the beginning, 'tail' keeps the end (useful for
+              transcripts where the latest exchanges matter most)
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARKER))
+    if max_chars == 0:
+        return ""
+    if keep == 'tail':
+        return TRUNCATION_MARKER + text[-max_chars:]
+    return text[:max_chars] + TRUNCATION_MARKER
+
+
+class PromptBuilder:
+    """
+    Assemble a prompt from named sections while staying under a token budget.
+
+    Sections are emitted in the order they were added. When the total is over
+    budget, sections are shrunk starting from the lowest priority, never below
+    their min_tokens, until the prompt fits. Sections with min_tokens=0 can be
+    dropped entirely; sections without min_tokens (typically instructions)
+    are kept whole. Only if that still doesn't fit are sections cut further,
+    again lowest priority first, so the highest-priority ones go last.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget or settings.PROMPT_TOKEN_BUDGET
+        self.sections = []
+
+    def add(self, text, priority=0, min_tokens=None, keep='head'):
+        self.sections.append({
+            'text': text or "",
+            'priority': priority,
+            'min_tokens': min_tokens,
+            'keep': keep
+        })
+        return self
+
+    def build(self):
+        sections = [dict(section) for section in self.sections]
+        by_priority = sorted(sections, key=lambda s: s['priority'])
+        # Minimums alone can exceed the budget; the budget always wins
+        for respect_minimum in (True, False):
+            for section in by_priority:
+                total = count_tokens(self._join(sections))
+                if total <= self.budget:
+                    return self._join(sections)
+                current = count_tokens(section['text'])
+                if not respect_minimum:
+                    floor = 0
+                elif section['min_tokens'] is None:
+                    floor = current
+                else:
+                    floor = section['min_tokens']
+                target = max(floor, current - (total - self.budget))
+                if target < current:
+                    section['text'] = truncate_to_tokens(section['text'], target, section['keep'])
+        return self._join(sections)
+
+    @staticmethod
+    def _join(sections):
+        return "\n".join(section['text'] for section in sections if section['text'])
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from ..models import ResumeAnalysisCache
+import hashlib
+import json
+
+
+def cache_key(pdf_bytes, prompt_version, model_id):
+    """Content address for a resume: the PDF bytes plus everything that shapes the analysis"""
+    digest = hashlib.sha256()
+    digest.update(pdf_bytes)
+    digest.update(f"|prompt:{prompt_version}|model:{model_id}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get_cached_analysis(key):
+    """
+    Look up a previously analyzed resume.
+
+    Returns:
+        (extracted_text, analysis) or None on a miss
+    """
+    entry = ResumeAnalysisCache.objects.filter(key=key).only('id', 'extracted_text', 'analysis').first()
+    if entry is None:
+        return None
+    ResumeAnalysisCache.objects.filter(id=entry.id).update(
+        hit_count=F('hit_count') + 1,
+        last_used_at=timezone.now()
+    )
+    return entry.extracted_text, entry.analysis
+
+
+def store_analysis(key, extracted_text, analysis):
+    """Save an analysis and evict least recently used entries beyond the configured limits"""
+    ResumeAnalysisCache.objects.update_or_create(
+        key=key,
+        defaults={
+            'extracted_text': extracted_text,
+            'analysis': analysis,
+            'size_bytes': len(extracted_text.encode('utf-8')) + len(json.dumps(analysis).encode('utf-8')),
+            'last_used_at': timezone.now()
+        }
+    )
+    _evict()
+
+
+def _evict():
+    max_entries = settings.RESUME_CACHE_MAX_ENTRIES
+    max_bytes = settings.RESUME_CACHE_MAX_BYTES
+    totals = ResumeAnalysisCache.objects.aggregate(entries=Count('id'), size=Sum('size_bytes'))
+    entries, total_bytes = totals['entries'], totals['size'] or 0
+    if entries <= max_entries and total_bytes <= max_bytes:
+        return
+    # Read only as many of the least recently used rows as must go
+    oldest = ResumeAnalysisCache.objects.order_by('last_used_at', 'id').values_list('id', 'size_bytes')
+    stale_ids = []
+    for entry_id, size_bytes in oldest.iterator(chunk_size=100):
+        if entries <= max_entries and total_bytes <= max_bytes:
+            break
+        stale_ids.append(entry_id)
+        entries -= 1
+        total_bytes -= size_bytes
+    ResumeAnalysisCache.objects.filter(id__in=stale_ids).delete()
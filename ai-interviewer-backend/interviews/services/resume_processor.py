@@ -1,7 +1,9 @@
 import fitz  
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import json
-from langchain_aws import ChatBedrock
+from .llm_pool import get_llm
+from .resume_cache import cache_key, get_cached_analysis, store_analysis
+from .prompt_builder import truncate_to_tokens
 from django.conf import settings
 import os
 
@@ -11,11 +13,26 @@ os.environ["AWS_ACCESS_KEY_ID"] = settings.AWS_ACCESS_KEY_ID
 os.environ["AWS_SECRET_ACCESS_KEY"] = settings.AWS_SECRET_ACCESS_KEY
 os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
 
+MODEL_ID = "amazon.titan-text-premier-v1:0"
+# Bump whenever the analysis prompt changes so cached results are not reused
+PROMPT_VERSION = 1
+
+
+def fallback_analysis(text=""):
+    """Basic analysis structure used when the resume could not be analyzed"""
+    return {
+        'has_excel_experience': False,
+        'skills': [],
+        'experience': "Could not extract experience",
+        'excel_proficiency': "Unknown",
+        'raw_text': text
+    }
+
 
 class ResumeProcessor:
     def __init__(self):
-        self.llm = ChatBedrock(
-            model_id="amazon.titan-text-premier-v1:0",
+        self.llm = get_llm(
+            MODEL_ID,
             model_kwargs={
                 "temperature": 0,
                 "max_tokens": 1024,
@@ -26,8 +43,19 @@ class ResumeProcessor:
         
     def process_resume(self, pdf_path):
         try:
+            with open(pdf_path, 'rb') as pdf_file:
+                pdf_bytes = pdf_file.read()
+
+            # Identical uploads skip extraction and the LLM call entirely
+            key = cache_key(pdf_bytes, PROMPT_VERSION, MODEL_ID)
+            cached = get_cached_analysis(key)
+            if cached is not None:
+                text, analysis = cached
+                print(f"Resume analysis cache hit: {key[:12]}")
+                return {**analysis, 'raw_text': text}
+
             # Extract text from PDF
-            doc = fitz.open(pdf_path)
+            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
             text = ""
             
             for page in doc:
@@ -39,7 +67,7 @@ class ResumeProcessor:
             prompt = f"""
             I need you to analyze this resume for an Excel technical interview:
 
-            {text}
+            {truncate_to_tokens(text, settings.PROMPT_TOKEN_BUDGET - 300)}
 
             Please provide the following analysis in JSON format:
             1. has_excel_experience: true/false - determine if the person has Excel experience
@@ -58,18 +86,13 @@ class ResumeProcessor:
             # Parse the JSON response
             try:
                 analysis = json.loads(response.content if hasattr(response, 'content') else str(response))
+                store_analysis(key, text, analysis)
                 # Add the raw text to the analysis
                 analysis['raw_text'] = text
                 return analysis
             except json.JSONDecodeError:
                 # If Claude didn't return proper JSON, create a basic structure
-                return {
-                    'has_excel_experience': False,
-                    'skills': [],
-                    'experience': "Could not extract experience",
-                    'excel_proficiency': "Unknown",
-                    'raw_text': text
-                }
+                return fallback_analysis(text)
 
         except Exception as e:
             raise Exception(f"Error processing resume: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,201 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .llm_pool import get_boto_client
+import asyncio
+import collections
+import hashlib
+import os
+import re
+import threading
+
+VOICE_ID = 'Joanna'
+OUTPUT_FORMAT = 'mp3'
+# Polly rejects plain-text requests longer than 3000 characters
+MAX_CHARS_PER_REQUEST = 3000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.TTS_MAX_PARALLEL,
+                    thread_name_prefix='tts'
+                )
+    return _executor
+
+
+class SpeechCache:
+    """
+    Two-tier cache of synthesized speech: an in-memory LRU bounded by total
+    bytes in front of a directory of audio files that survives restarts.
+    """
+
+    def __init__(self, max_memory_bytes, directory, max_disk_files):
+        self.max_memory_bytes = max_memory_bytes
+        self.directory = directory
+        self.max_disk_files = max_disk_files
+        self._entries = collections.OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text, voice_id, engine, output_format):
+        # Whitespace differences don't change the spoken audio
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{voice_id}|{engine}|{output_format}|{normalized}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                return audio
+        try:
+            with open(self._path(key), 'rb') as audio_file:
+                audio = audio_file.read()
+        except OSError:
+            return None
+        self._remember(key, audio)
+        return audio
+
+    def put(self, key, audio):
+        self._remember(key, audio)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as audio_file:
+                audio_file.write(audio)
+            os.replace(temp_path, self._path(key))
+            self._trim_disk()
+        except OSError as e:
+            print(f"Could not write speech cache entry: {str(e)}")
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.audio")
+
+    def _remember(self, key, audio):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = audio
+            self._memory_bytes += len(audio)
+            while self._memory_bytes > self.max_memory_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _trim_disk(self):
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.audio')]
+        if len(entries) <= self.max_disk_files:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_disk_files]:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
+
+_cache = None
+
+
+def get_speech_cache():
+    global _cache
+    if _cache is None:
+        with _executor_lock:
+            if _cache is None:
+                _cache = SpeechCache(
+                    settings.TTS_CACHE_MAX_BYTES,
+                    settings.TTS_CACHE_DIR,
+                    settings.TTS_CACHE_MAX_FILES
+                )
+    return _cache
+
+
+def synthesize_speech(text, engine='neural', voice_id=VOICE_ID, output_format=OUTPUT_FORMAT):
+    """Synthesize text with Polly and return the complete audio bytes, using the cache when possible"""
+    cache = get_speech_cache()
+    key = cache.key(text, voice_id, engine, output_format)
+    audio = cache.get(key)
+    if audio is not None:
+        return audio
+    polly_response = get_boto_client('polly').synthesize_speech(
+        Text=text,
+        OutputFormat=output_format,
+        VoiceId=voice_id,
+        Engine=engine
+    )
+    audio = polly_response['AudioStream'].read()
+    cache.put(key, audio)
+    return audio
+
+
+def split_sentences(text, min_chars=40):
+    """
+    Split text into sentence-sized chunks for incremental synthesis.
+    Very short sentences are merged with the next one so each request
+    carries enough text to sound natural.
+    """
+    sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text.strip()) if s.strip()]
+    chunks = []
+    current = ""
+    for sentence in sentences:
+        current = f"{current} {sentence}".strip()
+        if len(current) >= min_chars:
+            chunks.extend(_split_long(current))
+            current = ""
+    if current:
+        chunks.extend(_split_long(current))
+    return chunks
+
+
+def _split_long(text):
+    # Break on whitespace so a single run-on sentence still fits a Polly request
+    parts = []
+    while len(text) > MAX_CHARS_PER_REQUEST:
+        cut = text.rfind(' ', 0, MAX_CHARS_PER_REQUEST)
+        cut = cut if cut > 0 else MAX_CHARS_PER_REQUEST
+        parts.append(text[:cut])
+        text = text[cut:].strip()
+    if text:
+        parts.append(text)
+    return parts
+
+
+async def stream_speech(text, engine='neural', voice_id=VOICE_ID, output_format=OUTPUT_FORMAT):
+    """
+    Yield audio for text sentence by sentence, in order.
+
+    Up to TTS_MAX_PARALLEL sentences are synthesized ahead of the one being
+    sent, so the first chunk is available after a single short Polly call
+    and the rest of the message is pipelined behind it. MP3 frames from
+    consecutive chunks can be concatenated into one playable stream.
+
+    An async generator: under ASGI, Django sends each chunk as it is
+    yielded, where a sync iterator would be collected in full first.
+    """
+    executor = _get_executor()
+    pending = collections.deque()
+    sentences = iter(split_sentences(text))
+
+    def submit_next():
+        sentence = next(sentences, None)
+        if sentence is not None:
+            pending.append(executor.submit(synthesize_speech, sentence, engine, voice_id, output_format))
+
+    for _ in range(settings.TTS_MAX_PARALLEL):
+        submit_next()
+    try:
+        while pending:
+            audio = await asyncio.wrap_future(pending.popleft())
+            submit_next()
+            yield audio
+    finally:
+        # Client went away - don't keep synthesizing audio nobody will hear
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,139 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+import asyncio
+import threading
+
+
+class AssemblyAITranscriber:
+    """Hosted AssemblyAI transcription"""
+
+    sample_rate = 16000
+    # Compressed, since every byte is uploaded
+    audio_format = 'opus'
+
+    def __init__(self, api_key, verify_ssl=True):
+        import assemblyai as aai
+        if not verify_ssl:
+            import ssl
+            # Development only: for machines missing the CA bundle
+            ssl._create_default_https_context = ssl._create_unverified_context
+        aai.settings.api_key = api_key
+        self._aai = aai
+        self._transcriber = aai.Transcriber()
+        self.name = 'assemblyai'
+
+    def transcribe(self, audio):
+        return self._text(self._transcriber.transcribe(audio))
+
+    async def atranscribe(self, audio):
+        # The SDK uploads and polls for the result in its own thread pool
+        return self._text(await asyncio.wrap_future(self._transcriber.transcribe_async(audio)))
+
+    def _text(self, transcript):
+        if transcript.status == self._aai.TranscriptStatus.error:
+            raise Exception(f"Error transcribing audio: {transcript.error}")
+        return transcript.text or ""
+
+
+class WhisperTranscriber:
+    """
+    Local faster-whisper model on CPU, quantized to int8 by default. The
+    model is loaded on first use and shared by every request in the process.
+    """
+
+    sample_rate = 16000
+    # Decoded in process anyway, so encoding would only cost time
+    audio_format = 'wav'
+
+    def __init__(self, model_name, compute_type, max_parallel):
+        self.model_name = model_name
+        self.compute_type = compute_type
+        self.max_parallel = max_parallel
+        self.name = f"whisper-{model_name}"
+        self._model = None
+        self._lock = threading.Lock()
+        # Bounds concurrent decodes so CPU inference can't starve the workers
+        self._executor = ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix='stt')
+
+    def transcribe(self, audio):
+        segments, _ = self._get_model().transcribe(audio, language='en', beam_size=1)
+        # Segments are decoded lazily while iterating
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+    async def atranscribe(self, audio):
+        return await asyncio.wrap_future(self._executor.submit(self.transcribe, audio))
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from faster_whisper import WhisperModel
+                    self._model = WhisperModel(
+                        self.model_name,
+                        device='cpu',
+                        compute_type=self.compute_type,
+                        num_workers=self.max_parallel
+                    )
+        return self._model
+
+
+class FakeTranscriber:
+    """
+    Offline stand-in for tests. text can be a string or a callable taking
+    the audio file; empty audio transcribes to "" like silence.
+    """
+
+    sample_rate = 16000
+    audio_format = 'wav'
+
+    def __init__(self, text="This is a test answer."):
+        self.text = text
+        self.name = 'fake'
+
+    def transcribe(self, audio):
+        audio.seek(0)
+        if not audio.read(1):
+            return ""
+        audio.seek(0)
+        return self.text(audio) if callable(self.text) else self.text
+
+    async def atranscribe(self, audio):
+        return self.transcribe(audio)
+
+
+_transcriber = None
+_transcriber_override = None
+_transcriber_lock = threading.Lock()
+
+
+def _build_transcriber():
+    backend = settings.STT_BACKEND
+    if backend == 'assemblyai':
+        return AssemblyAITranscriber(settings.ASSEMBLY_AI, verify_ssl=settings.ASSEMBLY_AI_VERIFY_SSL)
+    if backend == 'whisper':
+        return WhisperTranscriber(
+            settings.STT_WHISPER_MODEL,
+            settings.STT_WHISPER_COMPUTE_TYPE,
+            settings.STT_MAX_PARALLEL
+        )
+    if backend == 'fake':
+        return FakeTranscriber()
+    raise Exception(f"Unknown STT_BACKEND: {backend}")
+
+
+def get_transcriber():
+    """Process-wide speech-to-text backend from settings.STT_BACKEND"""
+    global _transcriber
+    if _transcriber_override is not None:
+        return _transcriber_override
+    if _transcriber is None:
+        with _transcriber_lock:
+            if _transcriber is None:
+                _transcriber = _build_transcriber()
+    return _transcriber
+
+
+def set_transcriber(transcriber):
+    """Use the given backend, e.g. a FakeTranscriber in tests. Pass None to restore the configured one."""
+    global _transcriber_override
+    _transcriber_override = transcriber
@@ -0,0 +1,113 @@
+from .llm_pool import get_llm
+from .job_queue import job_handler, enqueue, RetryLater, QUEUED, RUNNING
+from ..models import Candidate, Interview, InterviewQuestion, BackgroundJob
+
+RESUME_ANALYSIS = 'resume_analysis'
+SCORE_ANSWER = 'score_answer'
+INTERVIEW_REPORT = 'interview_report'
+SUMMARIZE_TRANSCRIPT = 'summarize_transcript'
+
+
+def enqueue_resume_analysis(candidate):
+    """Queue background resume analysis for a freshly registered candidate"""
+    return enqueue(
+        RESUME_ANALYSIS,
+        {'candidate_id': str(candidate.id)},
+        ref=f"candidate:{candidate.id}"
+    )
+
+
+def _resume_analysis_failed(payload, error):
+    from .resume_processor import fallback_analysis
+    # Store a basic analysis so the interview can still go ahead
+    Candidate.objects.filter(id=payload['candidate_id']).update(
+        analysis_status='FAILED',
+        resume_analysis=fallback_analysis()
+    )
+
+
+@job_handler(RESUME_ANALYSIS, on_failure=_resume_analysis_failed)
+def analyze_resume(payload):
+    """Extract and analyze the candidate's resume, storing the result on the candidate"""
+    from .resume_processor import ResumeProcessor
+    candidate = Candidate.objects.filter(id=payload['candidate_id']).first()
+    if candidate is None:
+        # Candidate was deleted before the job ran
+        return
+    Candidate.objects.filter(id=candidate.id).update(analysis_status='PROCESSING')
+    processor = ResumeProcessor()
+    resume_analysis = processor.process_resume(candidate.resume.path)
+    candidate.resume_analysis = resume_analysis
+    candidate.analysis_status = 'READY'
+    candidate.save(update_fields=['resume_analysis', 'analysis_status'])
+    print(f"Resume analysis ready for candidate {candidate.id}")
+
+
+def enqueue_answer_scoring(question):
+    """Queue scoring of a candidate's answer so it stays off the turn's critical path"""
+    return enqueue(
+        SCORE_ANSWER,
+        {'question_id': question.id},
+        ref=f"interview:{question.interview_id}"
+    )
+
+
+def has_pending_scoring(interview):
+    """True while any answer of this interview is still waiting to be scored"""
+    return BackgroundJob.objects.filter(
+        ref=f"interview:{interview.id}",
+        job_type=SCORE_ANSWER,
+        status__in=[QUEUED, RUNNING]
+    ).exists()
+
+
+@job_handler(SCORE_ANSWER)
+def score_answer(payload):
+    """Score an answered question and persist the score onto InterviewQuestion"""
+    from .interview_service import InterviewService
+    question = InterviewQuestion.objects.filter(id=payload['question_id']).first()
+    if question is None or not question.answer:
+        return
+    InterviewService().score_answer(question)
+
+
+def enqueue_transcript_summary(interview_id):
+    """Queue folding of older transcript entries into the interview's running summary"""
+    ref = f"interview:{interview_id}"
+    # One pending summary per interview is enough; it covers everything up to the window
+    if BackgroundJob.objects.filter(ref=ref, job_type=SUMMARIZE_TRANSCRIPT, status__in=[QUEUED, RUNNING]).exists():
+        return None
+    return enqueue(SUMMARIZE_TRANSCRIPT, {'interview_id': interview_id}, ref=ref)
+
+
+@job_handler(SUMMARIZE_TRANSCRIPT)
+def summarize_transcript(payload):
+    """Extend the cached transcript summary used to keep prompts within budget"""
+    from .conversation_memory import get_conversation_memory
+    get_conversation_memory().summarize(payload['interview_id'], get_llm())
+
+
+def enqueue_interview_report(interview):
+    """Queue generation of the detailed HR report for a completed interview"""
+    return enqueue(
+        INTERVIEW_REPORT,
+        {'interview_id': interview.id},
+        ref=f"interview:{interview.id}"
+    )
+
+
+def _interview_report_failed(payload, error):
+    Interview.objects.filter(id=payload['interview_id']).update(report_status='FAILED')
+
+
+@job_handler(INTERVIEW_REPORT, on_failure=_interview_report_failed)
+def generate_interview_report(payload):
+    """Generate the detailed report and final score once every answer is scored"""
+    from .interview_service import InterviewService
+    interview = Interview.objects.select_related('candidate').filter(id=payload['interview_id']).first()
+    if interview is None:
+        return
+    if has_pending_scoring(interview):
+        raise RetryLater("Answer scoring still in progress")
+    InterviewService().generate_report(interview)
+    print(f"Detailed report ready for interview {interview.id}")
@@ -0,0 +1,86 @@
+from django.conf import settings
+import subprocess
+import wave
+import numpy as np
+
+# Sample rate ffmpeg decodes to: what speech-to-text models expect
+DECODE_SAMPLE_RATE = 16000
+FRAME_MS = 30
+
+
+def decode_audio(audio):
+    """
+    Decode audio to mono float samples in [-1, 1].
+
+    WAV is read directly; anything else is piped through ffmpeg.
+
+    Args:
+        audio: Seekable binary file, e.g. an uploaded file
+
+    Returns:
+        (samples, sample_rate), or None when the audio can't be decoded here
+    """
+    audio.seek(0)
+    try:
+        with wave.open(audio, 'rb') as wav:
+            return _wav_samples(wav), wav.getframerate()
+    except (wave.Error, EOFError):
+        pass
+    # An upload Django already spilled to disk is read in place
+    path = audio.temporary_file_path() if hasattr(audio, 'temporary_file_path') else None
+    audio.seek(0)
+    try:
+        result = subprocess.run(
+            [settings.FFMPEG_BINARY, '-v', 'error', '-nostdin', '-i', path or 'pipe:0',
+             '-f', 's16le', '-ac', '1', '-ar', str(DECODE_SAMPLE_RATE), 'pipe:1'],
+            input=None if path else audio.read(), capture_output=True, timeout=30
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"Could not decode audio: {str(e)}")
+        return None
+    if result.returncode != 0:
+        print(f"Could not decode audio: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return None
+    return np.frombuffer(result.stdout, dtype='<i2').astype(np.float32) / 32768.0, DECODE_SAMPLE_RATE
+
+
+def _wav_samples(wav):
+    width = wav.getsampwidth()
+    raw = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise wave.Error(f"Unsupported sample width: {width}")
+    channels = wav.getnchannels()
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def speech_bounds(samples, sample_rate):
+    """
+    Locate speech by frame energy.
+
+    Returns:
+        (start, end) in seconds, padded by VAD_PADDING_MS, or None when
+        fewer than VAD_MIN_SPEECH_MS of frames are above the threshold
+    """
+    frame = max(1, sample_rate * FRAME_MS // 1000)
+    count = len(samples) // frame
+    if count == 0:
+        return None
+    frames = samples[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    dbfs = 20 * np.log10(np.maximum(rms, 1e-10))
+    voiced = np.flatnonzero(dbfs > settings.VAD_ENERGY_THRESHOLD_DBFS)
+    if len(voiced) * FRAME_MS < settings.VAD_MIN_SPEECH_MS:
+        return None
+    padding = settings.VAD_PADDING_MS / 1000
+    duration = len(samples) / sample_rate
+    start = max(0.0, voiced[0] * FRAME_MS / 1000 - padding)
+    end = min(duration, (voiced[-1] + 1) * FRAME_MS / 1000 + padding)
+    return start, end
@@ -1,3 +1,1351 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.signals import request_started
+from django.core.management import call_command
+from django.core.files.uploadedfile import InMemoryUploadedFile, SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.db.utils import ConnectionHandler
+from django.test import TestCase, TransactionTestCase, AsyncClient, override_settings
+from langchain_core.messages import AIMessageChunk
+from django.utils import timezone
+from rest_framework.test import APIClient
+from unittest import mock
+import asyncio
+import datetime
+import fitz
+import io
+import json
+import os
+import re
+import runpy
+import subprocess
+import tempfile
+import time
+import threading
+import uuid
+import wave
+import numpy as np
+from .models import (
+    Candidate, Interview, InterviewQuestion, CandidateFitScore, CandidateEmbedding, BackgroundJob,
+    TranscriptEntry, ConversationState, ResumeAnalysisCache
+)
+from .services import speech_service
+from .services.speech_service import synthesize_speech
+from .services.audio_prep import prepare_audio
+from .services.audio_store import save_audio
+from .services.conversation_memory import ConversationMemory, get_conversation_memory
+from .services import embedding_index
+from .services.embedding_index import CandidateIndex, HashingEmbedder
+from .services import speech_to_text
+from .services.voice_activity import FRAME_MS, speech_bounds
+from .services.speech_to_text import FakeTranscriber, WhisperTranscriber, set_transcriber
+from .services.resume_cache import get_cached_analysis, store_analysis
+from .services.resume_processor import ResumeProcessor
+from .services.prompt_builder import PromptBuilder, count_tokens, TRUNCATION_MARKER
+from .services.llm_pool import get_llm, reset_clients, set_llm_factory, FakeLLM
+from .services.interview_service import InterviewService, ResumeAnalysisPending, SILENCE_REMINDER
+from .services import job_queue
+from .services.tasks import SCORE_ANSWER, enqueue_interview_report
+from .services.job_queue import job_handler, enqueue, run_job, recover_jobs, RetryLater, QUEUED, RUNNING, DONE, FAILED
 
-# Create your tests here.
+
+def fake_ranking_response(prompt):
+    if 'ONE candidate' in prompt:
+        return '{"match_score": 70, "strengths": ["Excel"], "gaps": [], "summary": "Good fit."}'
+    return '{"top_candidates": [], "analysis_summary": "Done."}'
+
+
+@override_settings(RANKING_MAX_CANDIDATES=1000)
+class AnalyzeJobCandidatesQueryTest(TestCase):
+    """Candidate ranking must not issue queries per candidate"""
+
+    CANDIDATES = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        candidates = Candidate.objects.bulk_create([
+            Candidate(
+                email=f"candidate{i}@example.com",
+                resume='resumes/resume.pdf',
+                resume_analysis={'skills': ['VLOOKUP'], 'experience': 'Analyst', 'raw_text': 'Excel analyst'}
+            ) for i in range(cls.CANDIDATES)
+        ])
+        interviews = Interview.objects.bulk_create([
+            Interview(
+                candidate=candidate,
+                interview_complete=True,
+                final_score=7,
+                detailed_report={'detailed_analysis': 'Solid answers.', 'question_breakdown': []}
+            ) for candidate in candidates
+        ])
+        InterviewQuestion.objects.bulk_create([
+            InterviewQuestion(
+                interview=interview,
+                question_number=number,
+                question_text='Explain VLOOKUP',
+                answer='It looks up values',
+                score=7,
+                question_type='excel_basic'
+            ) for interview in interviews for number in (1, 2)
+        ])
+        cls.candidate_data = [{'interview_id': interview.id} for interview in interviews]
+
+    def setUp(self):
+        set_llm_factory(lambda model_id, **kwargs: FakeLLM(model_id, responses=fake_ranking_response))
+        self.addCleanup(set_llm_factory, None)
+
+    def test_query_count_is_constant(self):
+        service = InterviewService()
+        # Interviews + candidates, question scores, cached fits, then one batched
+        # insert of the new fit scores (split by the backend's parameter limit)
+        with self.assertNumQueries(3 + self._fit_insert_queries()):
+            service.analyze_job_candidates('Data Analyst', 'Advanced Excel', self.candidate_data)
+        self.assertEqual(CandidateFitScore.objects.count(), self.CANDIDATES)
+
+        # Second run for the same job is served entirely from cached fit scores
+        with self.assertNumQueries(3):
+            service.analyze_job_candidates('Data Analyst', 'Advanced Excel', self.candidate_data)
+
+    def _fit_insert_queries(self):
+        fields = [field for field in CandidateFitScore._meta.concrete_fields if not field.primary_key]
+        batch_size = connection.ops.bulk_batch_size(fields, [None] * self.CANDIDATES)
+        return -(-self.CANDIDATES // batch_size)
+
+
+class CandidateRankingTest(TestCase):
+    """Fit scores are computed once per candidate and job, then only the shortlist is compared"""
+
+    def setUp(self):
+        self.llm = FakeLLM(responses=fake_ranking_response)
+        set_llm_factory(lambda model_id, **kwargs: self.llm)
+        self.addCleanup(set_llm_factory, None)
+        self.candidate_data = [{'interview_id': self._interview(i).id} for i in range(3)]
+
+    def _interview(self, i):
+        candidate = Candidate.objects.create(
+            email=f"rank{i}@example.com",
+            resume='resumes/resume.pdf',
+            resume_analysis={'skills': ['VLOOKUP'], 'raw_text': 'Excel analyst'}
+        )
+        return Interview.objects.create(
+            candidate=candidate,
+            interview_complete=True,
+            final_score=7,
+            detailed_report={'detailed_analysis': 'Solid answers.', 'question_breakdown': []}
+        )
+
+    def _prompts(self, kind):
+        return [prompt for prompt in self.llm.prompts if ('ONE candidate' in prompt) == (kind == 'fit')]
+
+    def test_cached_fit_scores_are_reused(self):
+        InterviewService().analyze_job_candidates('Data Analyst', 'Advanced Excel', self.candidate_data)
+        self.assertEqual(len(self._prompts('fit')), 3)
+        self.assertEqual(len(self._prompts('rank')), 1)
+        # The comparison sees each shortlisted candidate's fit
+        self.assertEqual(self._prompts('rank')[0].count('Good fit.'), 3)
+        stored = set(CandidateFitScore.objects.values_list('id', flat=True))
+        self.assertEqual(len(stored), 3)
+
+        # Only the new candidate is scored the second time round
+        self.llm.prompts.clear()
+        candidate_data = self.candidate_data + [{'interview_id': self._interview(3).id}]
+        InterviewService().analyze_job_candidates('Data Analyst', 'Advanced Excel', candidate_data)
+        self.assertEqual(len(self._prompts('fit')), 1)
+        self.assertEqual(len(self._prompts('rank')), 1)
+        self.assertTrue(stored < set(CandidateFitScore.objects.values_list('id', flat=True)))
+        self.assertEqual(CandidateFitScore.objects.count(), 4)
+
+        # A different job is scored afresh
+        self.llm.prompts.clear()
+        InterviewService().analyze_job_candidates('Data Analyst', 'Power BI', self.candidate_data)
+        self.assertEqual(len(self._prompts('fit')), 3)
+
+    @override_settings(RANKING_MAX_CANDIDATES=2)
+    def test_pool_is_capped(self):
+        with self.assertRaises(Exception):
+            InterviewService().analyze_job_candidates('Data Analyst', 'Advanced Excel', self.candidate_data)
+        self.assertEqual(self.llm.prompts, [])
+
+
+_deferrals = {'left': 0}
+_failures = []
+
+
+@job_handler('test_deferred', on_failure=lambda payload, error: _failures.append(str(error)))
+def _deferred_job(payload):
+    if payload.get('always') or _deferrals['left'] > 0:
+        _deferrals['left'] -= 1
+        raise RetryLater("Not ready", delay=0.01)
+
+
+@override_settings(JOB_QUEUE_EAGER=True, JOB_QUEUE_MAX_ATTEMPTS=3)
+class EagerJobQueueTest(TestCase):
+    """Eager mode runs jobs inline, including ones that ask to be retried later"""
+
+    def setUp(self):
+        _failures.clear()
+
+    def test_deferred_job_runs_once_due(self):
+        _deferrals['left'] = 2
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue('test_deferred', {})
+        job.refresh_from_db()
+        self.assertEqual(job.status, DONE)
+
+    def test_job_that_keeps_deferring_fails(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue('test_deferred', {'always': True})
+        job.refresh_from_db()
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(_failures, ["Not ready"])
+
+
+@override_settings(JOB_QUEUE_EAGER=False, JOB_QUEUE_MAX_DEFER_SECONDS=60, JOB_QUEUE_STALE_AFTER=60)
+class JobQueueTest(TestCase):
+    """Deferrals end eventually, and jobs outlive the process that queued them"""
+
+    def setUp(self):
+        _failures.clear()
+        patcher = mock.patch.object(job_queue, '_dispatch')
+        self.dispatch = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _job(self, status=QUEUED, age=0, **fields):
+        job = BackgroundJob.objects.create(job_type='test_deferred', payload={'always': True}, status=status, **fields)
+        past = timezone.now() - datetime.timedelta(seconds=age)
+        BackgroundJob.objects.filter(id=job.id).update(created_at=past, updated_at=past)
+        return job
+
+    def test_deferral_requeues_without_using_an_attempt(self):
+        job = self._job()
+        run_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (QUEUED, 0))
+        self.dispatch.assert_called_once_with(job.id, delay=0.01)
+
+    def test_job_deferring_past_the_deadline_fails(self):
+        job = self._job(age=120)
+        run_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(_failures, ["Not ready"])
+        self.dispatch.assert_not_called()
+
+    def test_recover_dispatches_queued_and_stale_jobs(self):
+        queued = self._job()
+        stale = self._job(status=RUNNING, age=120)
+        busy = self._job(status=RUNNING)
+        self.assertEqual(recover_jobs(), 2)
+        self.assertEqual({c.args[0] for c in self.dispatch.call_args_list}, {queued.id, stale.id})
+        busy.refresh_from_db()
+        self.assertEqual(busy.status, RUNNING)
+
+
+class LLMPoolTest(TestCase):
+    """Chat models and their clients are built once per process and shared"""
+
+    def setUp(self):
+        self.built = []
+        set_llm_factory(lambda model_id, **kwargs: self.built.append(model_id) or FakeLLM(model_id, **kwargs))
+        self.addCleanup(set_llm_factory, None)
+
+    def test_services_share_one_model(self):
+        first = InterviewService()
+        second = InterviewService()
+        self.assertIs(first.llm, second.llm)
+        self.assertEqual(len(self.built), 1)
+        # Other arguments are another model
+        self.assertIsNot(get_llm(first.model_id, model_kwargs={'temperature': 0}), first.llm)
+        self.assertEqual(len(self.built), 2)
+
+    def test_concurrent_first_use_builds_once(self):
+        models = []
+        threads = [threading.Thread(target=lambda: models.append(get_llm())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.built), 1)
+        self.assertEqual(len({id(model) for model in models}), 1)
+
+    @override_settings(LLM_BACKEND='bedrock')
+    def test_bedrock_client_is_shared(self):
+        set_llm_factory(None)
+        reset_clients()
+        self.addCleanup(reset_clients)
+        with mock.patch('interviews.services.llm_pool.boto3.client') as client, \
+                mock.patch('interviews.services.llm_pool.ChatBedrock') as chat:
+            InterviewService()
+            InterviewService()
+            get_llm('another-model')
+        client.assert_called_once()
+        self.assertEqual(chat.call_count, 2)
+        self.assertTrue(all(call.kwargs['client'] is client.return_value for call in chat.call_args_list))
+
+
+def make_pdf(text="Excel analyst experienced with VLOOKUP and pivot tables"):
+    document = fitz.open()
+    document.new_page().insert_text((72, 72), text)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+def fake_resume_response(prompt):
+    if 'JSON format' in prompt:
+        return '{"has_excel_experience": true, "skills": ["VLOOKUP"], "experience": "5 years", "excel_proficiency": "Advanced"}'
+    return 'Hello, what is your name?'
+
+
+class MediaRootTestMixin:
+    """Keeps uploaded resumes out of the source tree"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+@override_settings(JOB_QUEUE_EAGER=True)
+class RegisterCandidateTest(MediaRootTestMixin, TransactionTestCase):
+    """Registration queues the resume analysis and reports its state"""
+
+    def setUp(self):
+        super().setUp()
+        set_llm_factory(lambda model_id, **kwargs: FakeLLM(model_id, responses=fake_resume_response))
+        self.addCleanup(set_llm_factory, None)
+
+    def test_eager_analysis_is_in_the_response(self):
+        # Autocommit, as in production: the eager job runs inside the request
+        response = APIClient().post('/api/register/', {
+            'email': 'register@example.com',
+            'resume': SimpleUploadedFile('resume.pdf', make_pdf(), 'application/pdf')
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['analysis_status'], 'READY')
+        self.assertEqual(response.data['resume_analysis']['skills'], ['VLOOKUP'])
+        self.assertEqual(response.data['data']['resume_analysis']['skills'], ['VLOOKUP'])
+
+
+class ResumeAnalysisCacheTest(TestCase):
+    """Resume analyses are reused for identical files and kept within the cache limits"""
+
+    ANALYSIS = {'has_excel_experience': True, 'skills': ['VLOOKUP']}
+
+    def _keys(self):
+        return list(ResumeAnalysisCache.objects.order_by('last_used_at').values_list('key', flat=True))
+
+    def test_identical_file_is_a_hit(self):
+        llm = FakeLLM(responses=fake_resume_response)
+        set_llm_factory(lambda model_id, **kwargs: llm)
+        self.addCleanup(set_llm_factory, None)
+        content = make_pdf()
+        with tempfile.TemporaryDirectory() as directory:
+            results = []
+            # Same bytes under a different name
+            for name in ('first.pdf', 'second.pdf'):
+                path = f"{directory}/{name}"
+                with open(path, 'wb') as pdf:
+                    pdf.write(content)
+                results.append(ResumeProcessor().process_resume(path))
+        self.assertEqual(len(llm.prompts), 1)
+        self.assertEqual(results[0], results[1])
+        entry = ResumeAnalysisCache.objects.get()
+        self.assertEqual(entry.hit_count, 1)
+        self.assertEqual(
+            entry.size_bytes,
+            len(entry.extracted_text.encode('utf-8')) + len(json.dumps(entry.analysis).encode('utf-8'))
+        )
+
+    @override_settings(RESUME_CACHE_MAX_ENTRIES=3)
+    def test_least_recently_used_entries_are_evicted_at_the_entry_cap(self):
+        for i in range(3):
+            store_analysis(f"key{i}", "resume text", self.ANALYSIS)
+        # A hit keeps key0 over key1
+        self.assertIsNotNone(get_cached_analysis('key0'))
+        store_analysis('key3', "resume text", self.ANALYSIS)
+        self.assertEqual(self._keys(), ['key2', 'key0', 'key3'])
+
+    def test_least_recently_used_entries_are_evicted_at_the_byte_cap(self):
+        store_analysis('key0', "resume text", self.ANALYSIS)
+        size = ResumeAnalysisCache.objects.get().size_bytes
+        with override_settings(RESUME_CACHE_MAX_BYTES=2 * size):
+            store_analysis('key1', "resume text", self.ANALYSIS)
+            store_analysis('key2', "resume text", self.ANALYSIS)
+        self.assertEqual(self._keys(), ['key1', 'key2'])
+
+
+class GatedLLM(FakeLLM):
+    """Streams its first chunk, then waits for the test to release the rest"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = asyncio.Event()
+
+    async def astream(self, prompt, **kwargs):
+        yield AIMessageChunk(content="Hello")
+        await self.release.wait()
+        yield AIMessageChunk(content=" there?")
+
+
+@override_settings(JOB_QUEUE_EAGER=True, RESUME_ANALYSIS_WAIT_SECONDS=0)
+class StreamStartInterviewTest(TestCase):
+    """Server-sent events go out while the model is still generating"""
+
+    def setUp(self):
+        self.llm = GatedLLM()
+        set_llm_factory(lambda model_id, **kwargs: self.llm)
+        self.addCleanup(set_llm_factory, None)
+        self.candidate = Candidate.objects.create(
+            email='stream@example.com',
+            resume='resumes/resume.pdf',
+            analysis_status='READY',
+            resume_analysis={'raw_text': 'Excel analyst', 'skills': []}
+        )
+
+    async def test_first_token_arrives_before_the_reply_is_complete(self):
+        response = await AsyncClient().post(f'/api/interview/stream/start/{self.candidate.id}/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        # A sync iterator would be collected in full before sending under ASGI
+        self.assertTrue(response.is_async)
+        events = aiter(response.streaming_content)
+        self.assertEqual(await anext(events), b": stream open\n\n")
+        first = await asyncio.wait_for(anext(events), timeout=5)
+        self.assertIn(b'"Hello"', first)
+        self.llm.release.set()
+        rest = b"".join([event async for event in events])
+        self.assertIn(b'" there?"', rest)
+        self.assertIn(b"event: done", rest)
+        self.assertTrue(await Interview.objects.filter(candidate=self.candidate).aexists())
+
+
+def parse_events(body):
+    """(event, data) pairs of a server-sent event stream, comments skipped"""
+    events = []
+    for block in body.decode('utf-8').split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class BrokenLLM(FakeLLM):
+    """Fails part way through streaming"""
+
+    async def astream(self, prompt, **kwargs):
+        yield AIMessageChunk(content="Hello")
+        raise RuntimeError("Model unavailable")
+
+
+@override_settings(JOB_QUEUE_EAGER=True, RESUME_ANALYSIS_WAIT_SECONDS=0)
+class StreamEventsTest(TestCase):
+    """A streamed turn sends its tokens, then one final done or error event"""
+
+    GREETING = "Hello Sam, welcome to your Excel interview. Could you introduce yourself?"
+
+    def setUp(self):
+        self.candidate = Candidate.objects.create(
+            email='events@example.com',
+            resume='resumes/resume.pdf',
+            analysis_status='READY',
+            resume_analysis={'raw_text': 'Excel analyst', 'skills': []}
+        )
+        self.url = f'/api/interview/stream/start/{self.candidate.id}/'
+
+    def _use(self, llm):
+        set_llm_factory(lambda model_id, **kwargs: llm)
+        self.addCleanup(set_llm_factory, None)
+
+    async def _events(self):
+        response = await AsyncClient().post(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return parse_events(b"".join([chunk async for chunk in response.streaming_content]))
+
+    async def test_tokens_then_done(self):
+        self._use(FakeLLM(responses=self.GREETING))
+        events = await self._events()
+        names = [name for name, _ in events]
+        self.assertGreater(names.count('token'), 1)
+        self.assertEqual(names[-1], 'done')
+        self.assertEqual(names.count('done'), 1)
+        self.assertEqual("".join(data['text'] for name, data in events if name == 'token'), self.GREETING)
+        done = events[-1][1]['text_response']
+        self.assertEqual(done['message'], self.GREETING)
+        interview = await Interview.objects.aget(candidate=self.candidate)
+        self.assertEqual(done['interview_id'], interview.id)
+
+    async def test_failed_turn_ends_with_an_error(self):
+        self._use(BrokenLLM())
+        with mock.patch('builtins.print') as printed:
+            events = await self._events()
+        self.assertEqual(events[-1], ('error', {'error': "Error starting interview: Model unavailable"}))
+        self.assertNotIn('done', [name for name, _ in events])
+        printed.assert_any_call("Error in streamed turn: Error starting interview: Model unavailable")
+        # Nothing of the failed turn was saved
+        self.assertFalse(await Interview.objects.filter(candidate=self.candidate).aexists())
+
+
+class GatedPolly:
+    """Synthesizes the first sentence at once and the rest once released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def synthesize_speech(self, Text, **kwargs):
+        self.calls += 1
+        if self.calls > 1:
+            self.release.wait(timeout=5)
+        return {'AudioStream': io.BytesIO(Text.encode('utf-8'))}
+
+
+class CountingPolly:
+    """Polly stand-in that records what it was asked to synthesize"""
+
+    def __init__(self):
+        self.calls = []
+
+    def synthesize_speech(self, Text, **kwargs):
+        self.calls.append((Text, kwargs['Engine']))
+        return {'AudioStream': io.BytesIO(f"{kwargs['Engine']}:{Text}".encode('utf-8'))}
+
+
+class SpeechCacheTest(TestCase):
+    """Repeated phrases are synthesized once, from memory or from disk after a restart"""
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        settings_override = override_settings(TTS_CACHE_DIR=cache_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.cache_dir = cache_dir.name
+        self.polly = CountingPolly()
+        for patcher in (
+            mock.patch.object(speech_service, 'get_boto_client', return_value=self.polly),
+            mock.patch.object(speech_service, '_cache', None)
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_repeated_sentence_is_not_resynthesized(self):
+        first = synthesize_speech("Tell me about pivot tables.")
+        # Whitespace doesn't change the spoken audio
+        self.assertEqual(synthesize_speech("Tell me about  pivot tables.\n"), first)
+        self.assertEqual(len(self.polly.calls), 1)
+        # Another engine is another recording
+        synthesize_speech("Tell me about pivot tables.", engine='standard')
+        self.assertEqual(len(self.polly.calls), 2)
+
+    def test_disk_tier_survives_a_restart(self):
+        first = synthesize_speech("Tell me about pivot tables.")
+        speech_service._cache = None
+        self.assertEqual(synthesize_speech("Tell me about pivot tables."), first)
+        self.assertEqual(len(self.polly.calls), 1)
+
+    def test_warm_tts_cache(self):
+        out = io.StringIO()
+        call_command('warm_tts_cache', '--text', "Let's begin.", stdout=out)
+        self.assertEqual(len(self.polly.calls), 4)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 4)
+        self.assertIn("[standard]", out.getvalue())
+
+        # Served from the cache from then on, also by a fresh process
+        speech_service._cache = None
+        synthesize_speech(SILENCE_REMINDER, engine='standard')
+        call_command('warm_tts_cache', '--text', "Let's begin.", stdout=io.StringIO())
+        self.assertEqual(len(self.polly.calls), 4)
+
+
+class StreamInterviewSpeechTest(TestCase):
+    """Interviewer audio is sent sentence by sentence, not after the whole message"""
+
+    def setUp(self):
+        interview = Interview.objects.create(
+            candidate=Candidate.objects.create(email='speech@example.com', resume='resumes/resume.pdf')
+        )
+        # Unique text so nothing comes from the speech cache
+        self.first = f"First sentence of this reply, number {uuid.uuid4().hex}."
+        self.second = "Second sentence, which takes a while to synthesize."
+        TranscriptEntry.objects.create(
+            interview=interview, sequence=1, speaker='interviewer', text=f"{self.first} {self.second}"
+        )
+        self.url = f'/api/interview/speech/{interview.id}/'
+        self.polly = GatedPolly()
+        patcher = mock.patch.object(speech_service, 'get_boto_client', return_value=self.polly)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.polly.release.set)
+
+    async def test_first_sentence_arrives_before_the_rest_is_synthesized(self):
+        response = await AsyncClient().get(self.url)
+        self.assertEqual(response['Content-Type'], 'audio/mpeg')
+        self.assertTrue(response.is_async)
+        chunks = aiter(response.streaming_content)
+        first = await asyncio.wait_for(anext(chunks), timeout=5)
+        self.assertEqual(first, self.first.encode('utf-8'))
+        self.assertFalse(self.polly.release.is_set())
+        self.polly.release.set()
+        self.assertEqual(b"".join([chunk async for chunk in chunks]), self.second.encode('utf-8'))
+
+
+class InterviewResponsesPaginationTest(TestCase):
+    """The HR list pages by keyset, one query per page however deep"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        for i in range(7):
+            candidate = Candidate.objects.create(email=f"page{i}@example.com", resume='resumes/resume.pdf')
+            interview = Interview.objects.create(candidate=candidate, interview_complete=i % 2 == 0, final_score=i)
+            # Pairs share a day, so the cursor has to break ties on id
+            Interview.objects.filter(id=interview.id).update(created_at=now - datetime.timedelta(days=i // 2))
+
+    def test_pages_cover_every_interview_once(self):
+        client = APIClient()
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+            with self.assertNumQueries(1):
+                response = client.get('/api/interview/responses/', params)
+            self.assertEqual(response.status_code, 200)
+            seen += [row['interview_id'] for row in response.data['interviews']]
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, list(Interview.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+    def test_filters(self):
+        response = APIClient().get('/api/interview/responses/', {'complete': 'true', 'min_score': 2})
+        self.assertEqual([row['final_score'] for row in response.data['interviews']], [2, 4, 6])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = APIClient().get('/api/interview/responses/', {'cursor': 'zz'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AudioBlobTest(TestCase):
+    """Synthesized audio is served with range requests and revalidation"""
+
+    AUDIO = b"0123456789"
+
+    def setUp(self):
+        blob_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(blob_dir.cleanup)
+        settings_override = override_settings(AUDIO_BLOB_DIR=blob_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.url = f'/api/audio/{save_audio(self.AUDIO)}/'
+
+    def test_full_response(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.AUDIO)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, b"2345")
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(response.content, b"789")
+        self.assertEqual(response['Content-Range'], 'bytes 7-9/10')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_etag_revalidation(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_unknown_blob(self):
+        self.assertEqual(self.client.get('/api/audio/unknown/').status_code, 404)
+
+
+@override_settings(JOB_QUEUE_EAGER=True, RESUME_ANALYSIS_WAIT_SECONDS=0)
+class AtomicTurnTest(TestCase):
+    """A turn that fails part way leaves no trace of itself"""
+
+    def setUp(self):
+        self.llm_down = False
+        set_llm_factory(lambda model_id, **kwargs: FakeLLM(model_id, responses=self._respond))
+        self.addCleanup(set_llm_factory, None)
+        candidate = Candidate.objects.create(
+            email='atomic@example.com',
+            resume='resumes/resume.pdf',
+            analysis_status='READY',
+            resume_analysis={'raw_text': 'Excel analyst', 'excel_proficiency': 'Advanced', 'has_excel_experience': True, 'skills': []}
+        )
+        self.interview_id = InterviewService().start_interview(candidate.id)['interview_id']
+        InterviewService().process_response(self.interview_id, "My name is Sam")
+
+    def _respond(self, prompt):
+        if self.llm_down:
+            raise RuntimeError("Model unavailable")
+        if 'Return only the numeric score' in prompt:
+            return '7'
+        return 'Next question. What does VLOOKUP do?'
+
+    def _snapshot(self):
+        return (
+            Interview.objects.get(id=self.interview_id).current_question,
+            TranscriptEntry.objects.filter(interview_id=self.interview_id).count(),
+            list(InterviewQuestion.objects.filter(interview_id=self.interview_id).values_list('question_number', 'answer', 'score')),
+            ConversationState.objects.get(interview_id=self.interview_id).version
+        )
+
+    def test_failed_turn_is_rolled_back(self):
+        before = self._snapshot()
+        # The question being answered is on record, still unanswered
+        self.assertEqual(before[2][-1][1:], (None, None))
+        self.llm_down = True
+        with self.assertRaises(Exception):
+            InterviewService().process_response(self.interview_id, "It looks values up")
+        self.assertEqual(self._snapshot(), before)
+
+        # The same answer goes through once the model is back
+        self.llm_down = False
+        InterviewService().process_response(self.interview_id, "It looks values up")
+        self.assertEqual(
+            TranscriptEntry.objects.filter(interview_id=self.interview_id).count(),
+            before[1] + 2
+        )
+
+
+def make_wav(samples, rate=16000, channels=1):
+    """16-bit WAV of float samples in [-1, 1], shaped (frames,) or (frames, channels)"""
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes((np.asarray(samples) * 32767).astype('<i2').tobytes())
+    return output.getvalue()
+
+
+@override_settings(VAD_ENERGY_THRESHOLD_DBFS=-45, VAD_MIN_SPEECH_MS=250, VAD_PADDING_MS=300)
+class SpeechBoundsTest(TestCase):
+    """Voice activity detection trims silence around the answer"""
+
+    RATE = 16000
+
+    def _tone(self, seconds):
+        t = np.arange(int(seconds * self.RATE)) / self.RATE
+        return (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+    def _silence(self, seconds):
+        return np.zeros(int(seconds * self.RATE), dtype=np.float32)
+
+    def test_tone_between_silences(self):
+        samples = np.concatenate([self._silence(1), self._tone(1), self._silence(1.5)])
+        start, end = speech_bounds(samples, self.RATE)
+        # Padded by 300 ms either side, to within one frame
+        self.assertAlmostEqual(start, 0.7, delta=FRAME_MS / 1000)
+        self.assertAlmostEqual(end, 2.3, delta=FRAME_MS / 1000)
+
+    def test_padding_stays_within_the_clip(self):
+        samples = np.concatenate([self._tone(1), self._silence(0.1)])
+        self.assertEqual(speech_bounds(samples, self.RATE), (0.0, 1.1))
+
+    def test_silence(self):
+        self.assertIsNone(speech_bounds(self._silence(2), self.RATE))
+        self.assertIsNone(speech_bounds(np.zeros(0, dtype=np.float32), self.RATE))
+
+    def test_blip_shorter_than_the_minimum(self):
+        samples = np.concatenate([self._silence(1), self._tone(0.1), self._silence(1)])
+        self.assertIsNone(speech_bounds(samples, self.RATE))
+
+
+class PrepareAudioTest(TestCase):
+    """Uploads are downmixed and resampled to what the transcriber expects"""
+
+    @override_settings(VAD_ENABLED=False)
+    def test_stereo_44100_becomes_mono_16000(self):
+        t = np.arange(2 * 44100) / 44100
+        tone = 0.5 * np.sin(2 * np.pi * 440 * t)
+        upload = io.BytesIO(make_wav(np.stack([tone, tone], axis=1), rate=44100, channels=2))
+        with wave.open(prepare_audio(upload, 16000, 'wav'), 'rb') as wav:
+            self.assertEqual((wav.getnchannels(), wav.getsampwidth(), wav.getframerate()), (1, 2, 16000))
+            self.assertEqual(wav.getnframes(), 32000)
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2') / 32768.0
+        # Still the same tone, not averaged away or aliased
+        self.assertAlmostEqual(np.sqrt(np.mean(np.square(samples))), 0.5 / np.sqrt(2), delta=0.02)
+
+    def test_undecodable_input_is_passed_through(self):
+        upload = io.BytesIO(b"not audio at all")
+        upload.seek(5)
+        failed = subprocess.CompletedProcess([], 1, stdout=b"", stderr=b"Invalid data found when processing input")
+        with mock.patch('interviews.services.voice_activity.subprocess.run', return_value=failed):
+            prepared = prepare_audio(upload, 16000, 'wav')
+        # Left for the transcriber to try, from the start
+        self.assertIs(prepared, upload)
+        self.assertEqual(prepared.tell(), 0)
+
+    def test_missing_ffmpeg_passes_input_through(self):
+        upload = io.BytesIO(b"not audio at all")
+        with mock.patch('interviews.services.voice_activity.subprocess.run', side_effect=FileNotFoundError('ffmpeg')):
+            self.assertIs(prepare_audio(upload, 16000, 'wav'), upload)
+
+    def _opus(self, run, which='/usr/bin/ffmpeg'):
+        upload = io.BytesIO(make_wav(0.5 * np.sin(2 * np.pi * 440 * np.arange(16000) / 16000)))
+        with mock.patch('interviews.services.audio_prep.shutil.which', return_value=which), \
+                mock.patch('interviews.services.audio_prep.subprocess.run', **run) as encoder:
+            return prepare_audio(upload, 16000, 'opus'), encoder
+
+    @override_settings(VAD_ENABLED=False)
+    def test_opus_encoding(self):
+        encoded = subprocess.CompletedProcess([], 0, stdout=b"OggS opus", stderr=b"")
+        prepared, encoder = self._opus({'return_value': encoded})
+        self.assertEqual(prepared.read(), b"OggS opus")
+        args, kwargs = encoder.call_args
+        self.assertEqual(args[0][0], '/usr/bin/ffmpeg')
+        self.assertIn('libopus', args[0])
+        # 16-bit mono PCM in
+        self.assertEqual(len(kwargs['input']), 32000)
+
+    @override_settings(VAD_ENABLED=False)
+    def test_missing_ffmpeg_falls_back_to_wav(self):
+        prepared, encoder = self._opus({}, which=None)
+        encoder.assert_not_called()
+        with wave.open(prepared, 'rb') as wav:
+            self.assertEqual((wav.getnchannels(), wav.getframerate(), wav.getnframes()), (1, 16000, 16000))
+
+    @override_settings(VAD_ENABLED=False)
+    def test_failed_encoding_falls_back_to_wav(self):
+        failed = subprocess.CompletedProcess([], 1, stdout=b"", stderr=b"Unknown encoder 'libopus'")
+        prepared, encoder = self._opus({'return_value': failed})
+        encoder.assert_called_once()
+        with wave.open(prepared, 'rb') as wav:
+            self.assertEqual(wav.getnframes(), 16000)
+
+
+class TranscriberSelectionTest(TestCase):
+    """The speech-to-text backend follows settings.STT_BACKEND"""
+
+    def setUp(self):
+        # Build afresh instead of reusing the process-wide backend
+        patcher = mock.patch.object(speech_to_text, '_transcriber', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(STT_BACKEND='assemblyai', ASSEMBLY_AI='key', ASSEMBLY_AI_VERIFY_SSL=True)
+    def test_assemblyai(self):
+        with mock.patch.object(speech_to_text, 'AssemblyAITranscriber') as backend:
+            self.assertIs(speech_to_text.get_transcriber(), backend.return_value)
+        backend.assert_called_once_with('key', verify_ssl=True)
+
+    @override_settings(STT_BACKEND='whisper', STT_WHISPER_MODEL='tiny.en', STT_WHISPER_COMPUTE_TYPE='int8', STT_MAX_PARALLEL=3)
+    def test_whisper(self):
+        transcriber = speech_to_text.get_transcriber()
+        self.assertIsInstance(transcriber, WhisperTranscriber)
+        self.assertEqual((transcriber.model_name, transcriber.compute_type, transcriber.max_parallel), ('tiny.en', 'int8', 3))
+        # Built once, and the model only loaded on first use
+        self.assertIs(speech_to_text.get_transcriber(), transcriber)
+        self.assertIsNone(transcriber._model)
+
+    @override_settings(STT_BACKEND='fake')
+    def test_fake(self):
+        self.assertIsInstance(speech_to_text.get_transcriber(), FakeTranscriber)
+
+    @override_settings(STT_BACKEND='unknown')
+    def test_unknown_backend_raises(self):
+        with self.assertRaises(Exception):
+            speech_to_text.get_transcriber()
+
+
+@override_settings(VAD_ENABLED=True)
+class AudioUploadTest(TestCase):
+    """Answers are prepared straight from the upload, and silence never reaches the transcriber"""
+
+    def setUp(self):
+        self.transcriber = FakeTranscriber()
+        self.transcriber.atranscribe = mock.AsyncMock(wraps=self.transcriber.atranscribe)
+        set_transcriber(self.transcriber)
+        self.addCleanup(set_transcriber, None)
+        interview = Interview.objects.create(
+            candidate=Candidate.objects.create(email='upload@example.com', resume='resumes/resume.pdf')
+        )
+        # Streamed audio, so no speech is synthesized
+        self.url = f'/api/interview/respond-audio/{interview.id}/?audio=stream'
+        patcher = mock.patch('interviews.api.views.prepare_audio', wraps=prepare_audio)
+        self.prepare_audio = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _post(self, content):
+        response = self.client.post(self.url, {'audio': SimpleUploadedFile('answer.wav', content, 'audio/wav')})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_silent_upload_is_not_transcribed(self):
+        data = self._post(make_wav(np.zeros(32000)))
+        self.assertEqual(data['transcribed_text'], "")
+        self.assertEqual(data['text_response']['message'], SILENCE_REMINDER)
+        self.transcriber.atranscribe.assert_not_called()
+        # Read where Django left it, without a copy on disk
+        self.assertIsInstance(self.prepare_audio.call_args[0][0], InMemoryUploadedFile)
+
+    def test_empty_upload_is_not_transcribed(self):
+        data = self._post(b"")
+        self.assertEqual(data['transcribed_text'], "")
+        self.transcriber.atranscribe.assert_not_called()
+
+
+@override_settings(RESUME_ANALYSIS_WAIT_SECONDS=0)
+class AnswerScoringTest(TestCase):
+    """Answers are scored by a background job, and difficulty follows the stored scores"""
+
+    def setUp(self):
+        self.llm = FakeLLM(responses=self._respond)
+        set_llm_factory(lambda model_id, **kwargs: self.llm)
+        self.addCleanup(set_llm_factory, None)
+        candidate = Candidate.objects.create(
+            email='scoring@example.com',
+            resume='resumes/resume.pdf',
+            analysis_status='READY',
+            resume_analysis={'raw_text': 'Excel user', 'excel_proficiency': 'Beginner', 'has_excel_experience': True, 'skills': []}
+        )
+        self.interview_id = InterviewService().start_interview(candidate.id)['interview_id']
+        # Callbacks aren't run in a test transaction, so queued jobs stay queued
+        while not self._scoring_jobs():
+            InterviewService().process_response(self.interview_id, "A VLOOKUP finds a value in a table")
+
+    def _respond(self, prompt):
+        if 'Return only the numeric score' in prompt:
+            return self.score
+        return 'Next question. What does INDEX MATCH do?'
+
+    def _scoring_jobs(self):
+        return BackgroundJob.objects.filter(job_type=SCORE_ANSWER, ref=f"interview:{self.interview_id}")
+
+    def _next_difficulty(self):
+        self.llm.prompts.clear()
+        InterviewService().process_response(self.interview_id, "INDEX MATCH looks up in any direction")
+        return re.search(r"Generate an? (\w+) level Excel question", self.llm.prompts[-1]).group(1)
+
+    def test_answer_is_scored_in_the_background(self):
+        job = self._scoring_jobs().get()
+        self.assertEqual(job.status, QUEUED)
+        question = InterviewQuestion.objects.get(id=job.payload['question_id'])
+        self.assertIsNotNone(question.answer)
+        self.assertIsNone(question.score)
+        self.assertFalse(any('Return only the numeric score' in prompt for prompt in self.llm.prompts))
+
+        self.score = '9'
+        run_job(job.id)
+        question.refresh_from_db()
+        self.assertEqual(question.score, 9)
+
+    def test_difficulty_follows_a_high_score(self):
+        self.score = '9'
+        run_job(self._scoring_jobs().get().id)
+        # A beginner's second Excel question would be moderate
+        self.assertEqual(self._next_difficulty(), 'difficult')
+
+    def test_difficulty_follows_a_low_score(self):
+        self.score = '2'
+        run_job(self._scoring_jobs().get().id)
+        self.assertEqual(self._next_difficulty(), 'easy')
+
+    def test_difficulty_without_a_score_yet(self):
+        self.assertEqual(self._next_difficulty(), 'moderate')
+
+
+@override_settings(JOB_QUEUE_EAGER=True, EMBEDDING_BACKEND='hashing')
+class InterviewReportTest(TestCase):
+    """The report waits for answer scoring, then goes from PENDING to READY"""
+
+    def setUp(self):
+        set_llm_factory(lambda model_id, **kwargs: FakeLLM(model_id, responses=self._respond))
+        self.addCleanup(set_llm_factory, None)
+        # Nothing was left queued by an earlier process; don't let the first request redispatch
+        request_started.disconnect(dispatch_uid='interviews-recover-jobs')
+        interview = Interview.objects.create(
+            candidate=Candidate.objects.create(
+                email='report@example.com',
+                resume='resumes/resume.pdf',
+                resume_analysis={'raw_text': 'Excel analyst'}
+            ),
+            interview_complete=True,
+            report_status='PENDING'
+        )
+        self.interview = interview
+        self.question = InterviewQuestion.objects.create(
+            interview=interview,
+            question_number=3,
+            question_text='What does VLOOKUP do?',
+            answer='It finds a value in a table',
+            question_type='excel_basic'
+        )
+        # Created directly, so it waits until the test runs it
+        self.scoring = BackgroundJob.objects.create(
+            job_type=SCORE_ANSWER, payload={'question_id': self.question.id}, ref=f"interview:{interview.id}"
+        )
+        self.url = f'/api/interview/report/{interview.id}/'
+
+    def _respond(self, prompt):
+        if 'Return only the numeric score' in prompt:
+            return '8'
+        return 'Strong Excel fundamentals.'
+
+    def _queue_report(self):
+        # Runs inline once the enqueueing transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return enqueue_interview_report(self.interview)
+
+    def _sleep(self, delay):
+        # Let the wait pass without waiting
+        BackgroundJob.objects.update(run_after=F('run_after') - datetime.timedelta(seconds=delay))
+
+    def test_report_waits_for_scoring(self):
+        seen = []
+
+        def scoring_finishes(delay):
+            # The report deferred: still pending, then the answer is scored meanwhile
+            response = APIClient().get(self.url)
+            seen.append((response.status_code, response.data['report_status']))
+            run_job(self.scoring.id)
+            self._sleep(delay)
+
+        with mock.patch.object(job_queue.time, 'sleep', side_effect=scoring_finishes) as sleep:
+            report = self._queue_report()
+        sleep.assert_called_once()
+        self.assertEqual(seen, [(202, 'PENDING')])
+        report.refresh_from_db()
+        self.assertEqual(report.status, DONE)
+
+        response = APIClient().get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['report_status'], 'READY')
+        self.assertEqual(response.data['final_score'], 8)
+        self.assertEqual(response.data['detailed_report']['detailed_analysis'], 'Strong Excel fundamentals.')
+
+    def test_report_fails_when_scoring_never_finishes(self):
+        with mock.patch.object(job_queue.time, 'sleep', side_effect=self._sleep):
+            report = self._queue_report()
+        report.refresh_from_db()
+        self.assertEqual(report.status, FAILED)
+        response = APIClient().get(self.url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['report_status'], 'FAILED')
+
+
+@override_settings(RESUME_ANALYSIS_WAIT_SECONDS=0)
+class TranscriptSequenceTest(TestCase):
+    """Transcript entries are numbered 1, 2, 3... across turns, silences and failed turns"""
+
+    def setUp(self):
+        self.llm_down = False
+        set_llm_factory(lambda model_id, **kwargs: FakeLLM(model_id, responses=self._respond))
+        self.addCleanup(set_llm_factory, None)
+        candidate = Candidate.objects.create(
+            email='sequence@example.com',
+            resume='resumes/resume.pdf',
+            analysis_status='READY',
+            resume_analysis={'raw_text': 'Excel analyst', 'excel_proficiency': 'Advanced', 'has_excel_experience': True, 'skills': []}
+        )
+        self.interview_id = InterviewService().start_interview(candidate.id)['interview_id']
+
+    def _respond(self, prompt):
+        if self.llm_down:
+            raise RuntimeError("Model unavailable")
+        return 'Next question. What does VLOOKUP do?'
+
+    def test_sequences_stay_contiguous(self):
+        service = InterviewService()
+        service.process_response(self.interview_id, "My name is Sam")
+        service.handle_silence(self.interview_id)
+        self.llm_down = True
+        with self.assertRaises(Exception):
+            service.process_response(self.interview_id, "Lost answer")
+        self.llm_down = False
+        for answer in ("I build dashboards", "It looks values up"):
+            service.process_response(self.interview_id, answer)
+
+        entries = list(TranscriptEntry.objects.filter(interview_id=self.interview_id).order_by('sequence'))
+        self.assertEqual([entry.sequence for entry in entries], list(range(1, len(entries) + 1)))
+        # Greeting, three answered turns of two entries and the reminder
+        self.assertEqual(len(entries), 8)
+        self.assertEqual(entries[3].text, SILENCE_REMINDER)
+        self.assertNotIn("Lost answer", [entry.text for entry in entries])
+
+
+class TranscriptMigrationTest(TransactionTestCase):
+    """Migration 0009 carries legacy JSON transcripts over into TranscriptEntry rows"""
+
+    before = [('interviews', '0008_interview_report_status')]
+    after = [('interviews', '0009_transcriptentry')]
+
+    def tearDown(self):
+        # Back to the current schema for the tests that follow
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_legacy_transcripts_become_entries(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        Candidate = apps.get_model('interviews', 'Candidate')
+        Interview = apps.get_model('interviews', 'Interview')
+        candidate = Candidate.objects.create(email='legacy@example.com', resume='resumes/resume.pdf')
+        legacy = Interview.objects.create(candidate=candidate, transcript=[
+            {'speaker': 'interviewer', 'text': 'Hello, what is your name?', 'timestamp': '2024-03-01T10:00:00'},
+            {'speaker': 'candidate', 'text': 'Sam', 'timestamp': 'not a date'},
+            {'speaker': 'interviewer', 'text': 'Tell me about Excel.'}
+        ])
+        empty = Interview.objects.create(candidate=candidate, transcript=None)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        TranscriptEntry = apps.get_model('interviews', 'TranscriptEntry')
+        entries = list(TranscriptEntry.objects.filter(interview_id=legacy.id).order_by('sequence'))
+        self.assertEqual(
+            [(entry.sequence, entry.speaker, entry.text) for entry in entries],
+            [(1, 'interviewer', 'Hello, what is your name?'), (2, 'candidate', 'Sam'), (3, 'interviewer', 'Tell me about Excel.')]
+        )
+        self.assertEqual(entries[0].timestamp, timezone.make_aware(datetime.datetime(2024, 3, 1, 10, 0)))
+        # Unparseable or missing timestamps fall back to the last interaction
+        self.assertEqual(entries[1].timestamp, legacy.last_interaction)
+        self.assertFalse(TranscriptEntry.objects.filter(interview_id=empty.id).exists())
+
+
+class SQLiteTuningTest(TestCase):
+    """SQLITE_TUNING opens connections in WAL mode with a busy timeout"""
+
+    def _tuned_database(self, **env):
+        with mock.patch.dict(os.environ, {'DB_ENGINE': 'sqlite', 'SQLITE_TUNING': 'True', **env}):
+            database = runpy.run_path(os.path.join(settings.BASE_DIR, 'core', 'settings.py'))['DATABASES']['default']
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # A handler of its own, apart from the test database
+        connections = ConnectionHandler({'default': {**database, 'NAME': os.path.join(directory.name, 'tuned.sqlite3')}})
+        self.addCleanup(connections.close_all)
+        return connections['default']
+
+    def _pragma(self, tuned, name):
+        with tuned.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        tuned = self._tuned_database(SQLITE_BUSY_TIMEOUT='7')
+        self.assertEqual(self._pragma(tuned, 'journal_mode'), 'wal')
+        self.assertEqual(self._pragma(tuned, 'busy_timeout'), 7000)
+        # NORMAL
+        self.assertEqual(self._pragma(tuned, 'synchronous'), 1)
+        # MEMORY
+        self.assertEqual(self._pragma(tuned, 'temp_store'), 2)
+        self.assertEqual(tuned.transaction_mode, 'IMMEDIATE')
+
+    def test_untuned_by_default(self):
+        with mock.patch.dict(os.environ, {'DB_ENGINE': 'sqlite', 'SQLITE_TUNING': 'False'}):
+            database = runpy.run_path(os.path.join(settings.BASE_DIR, 'core', 'settings.py'))['DATABASES']['default']
+        self.assertNotIn('OPTIONS', database)
+
+
+class DeleteAllDataTest(TestCase):
+    """Ids restart after deleting everything, so nothing may survive keyed by an old one"""
+
+    def _interview(self):
+        candidate = Candidate.objects.create(email='delete@example.com', resume='resumes/resume.pdf')
+        return Interview.objects.create(candidate=candidate)
+
+    def test_reused_ids_start_clean(self):
+        interview = self._interview()
+        memory = get_conversation_memory()
+        # Another worker holding the same conversation in its own cache
+        other_worker = ConversationMemory(max_tokens=1000, cache_size=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            memory.extend(interview.id, [{'speaker': 'candidate', 'text': 'Old answer', 'sequence': 1}])
+            self.assertEqual(len(other_worker.recent(interview.id)), 1)
+        BackgroundJob.objects.create(job_type='score_answer', ref=f"interview:{interview.id}")
+        CandidateFitScore.objects.create(job_key='job', interview=interview, match_score=50, fit={})
+        CandidateEmbedding.objects.create(interview=interview, model_name='hashing', dim=1, vector=b'\0\0\0\0')
+        ResumeAnalysisCache.objects.create(key='resume', extracted_text='Excel', analysis={})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post('/api/delete-all/')
+        self.assertEqual(response.status_code, 200)
+        for model in (Candidate, Interview, ConversationState, BackgroundJob, CandidateFitScore,
+                      CandidateEmbedding, ResumeAnalysisCache):
+            self.assertFalse(model.objects.exists(), model.__name__)
+
+        reused = self._interview()
+        self.assertEqual(reused.id, interview.id)
+        self.assertEqual(memory.recent(reused.id), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            memory.extend(reused.id, [{'speaker': 'candidate', 'text': 'New answer', 'sequence': 1}])
+        self.assertIn(interview.id, other_worker._cache)
+        # Same id and version as the stale entry, but written later
+        self.assertEqual([m['text'] for m in other_worker.recent(reused.id)], ['New answer'])
+
+
+class ConversationMemoryCacheTest(TestCase):
+    """Only committed conversation state is cached"""
+
+    def setUp(self):
+        candidate = Candidate.objects.create(email='memory@example.com', resume='resumes/resume.pdf')
+        self.interview_id = Interview.objects.create(candidate=candidate).id
+        self.memory = ConversationMemory(max_tokens=1000, cache_size=10)
+
+    def _extend(self, text):
+        self.memory.extend(self.interview_id, [{'speaker': 'candidate', 'text': text, 'sequence': None}])
+
+    def test_rolled_back_write_is_not_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._extend("First answer")
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self._extend("Answer of a failed turn")
+                raise RuntimeError("Turn failed")
+        self.assertEqual(self.memory._cache[self.interview_id]['version'], 1)
+        self.assertEqual([m['text'] for m in self.memory.recent(self.interview_id)], ["First answer"])
+
+
+class CandidateIndexTest(TestCase):
+    """The in-memory index follows embeddings written and deleted by other workers"""
+
+    def setUp(self):
+        self.embedder = HashingEmbedder(64)
+        self.interviews = [
+            Interview.objects.create(
+                candidate=Candidate.objects.create(
+                    email=f"index{i}@example.com",
+                    resume='resumes/resume.pdf',
+                    resume_analysis={'skills': [skill], 'raw_text': skill}
+                ),
+                interview_complete=True,
+                detailed_report={'detailed_analysis': skill}
+            ) for i, skill in enumerate(['pivot tables', 'vlookup macros', 'power query'])
+        ]
+
+    def _store(self, interview):
+        vector = self.embedder.encode([embedding_index.candidate_text(
+            interview.candidate.resume_analysis, interview.detailed_report
+        )])[0]
+        CandidateEmbedding.objects.create(
+            interview=interview, model_name=self.embedder.name, dim=vector.shape[0], vector=vector.tobytes()
+        )
+
+    def test_replaced_embedding_is_dropped(self):
+        first, second, third = self.interviews
+        index = CandidateIndex(self.embedder)
+        self._store(first)
+        self._store(second)
+        self.assertEqual({i for i, _ in index.nearest('vlookup', 3)}, {first.id, second.id})
+
+        # Elsewhere one embedding goes and another arrives, leaving the count unchanged
+        CandidateEmbedding.objects.filter(interview=second).delete()
+        self._store(third)
+        self.assertEqual({i for i, _ in index.nearest('vlookup', 3)}, {first.id, third.id})
+
+    @override_settings(EMBEDDING_BACKEND='auto', EMBEDDING_DIM=64)
+    def test_auto_backend_falls_back_when_the_model_fails_to_load(self):
+        with mock.patch.object(embedding_index, 'SentenceTransformerEmbedder', side_effect=OSError("No network")):
+            self.assertIsInstance(embedding_index.get_embedder(), HashingEmbedder)
+
+    @override_settings(EMBEDDING_BACKEND='sentence-transformers')
+    def test_explicit_backend_raises(self):
+        with mock.patch.object(embedding_index, 'SentenceTransformerEmbedder', side_effect=OSError("No network")):
+            with self.assertRaises(OSError):
+                embedding_index.get_embedder()
+
+
+class PromptBudgetTest(TestCase):
+    """Over-long prompts lose material, never the instructions that follow it"""
+
+    INSTRUCTIONS = "Just provide the natural conversational response directly."
+
+    def test_minimums_over_budget_shrink_low_priority_sections(self):
+        builder = PromptBuilder(budget=100)
+        builder.add("You are an interviewer.", priority=10)
+        builder.add("resume " * 1000, priority=1, min_tokens=300)
+        builder.add("Return only JSON.", priority=10)
+        prompt = builder.build()
+        self.assertLessEqual(count_tokens(prompt), 100)
+        self.assertTrue(prompt.startswith("You are an interviewer."))
+        self.assertTrue(prompt.endswith("Return only JSON."))
+
+    @override_settings(JOB_QUEUE_EAGER=True, RESUME_ANALYSIS_WAIT_SECONDS=0)
+    def test_long_answer_keeps_question_instructions(self):
+        prompts = []
+
+        def respond(prompt):
+            prompts.append(prompt)
+            return '7' if 'Return only the numeric score' in prompt else 'Next question?'
+
+        set_llm_factory(lambda model_id, **kwargs: FakeLLM(model_id, responses=respond))
+        self.addCleanup(set_llm_factory, None)
+        candidate = Candidate.objects.create(
+            email='budget@example.com',
+            resume='resumes/resume.pdf',
+            analysis_status='READY',
+            resume_analysis={'raw_text': 'Excel analyst', 'excel_proficiency': 'Advanced', 'has_excel_experience': True, 'skills': []}
+        )
+        service = InterviewService()
+        interview_id = service.start_interview(candidate.id)['interview_id']
+        for answer in ("Sam", "I build dashboards", "formula " * 40000):
+            with self.captureOnCommitCallbacks(execute=True):
+                service.process_response(interview_id, answer)
+        excel_prompt = next(p for p in reversed(prompts) if 'level Excel question' in p)
+        self.assertLessEqual(count_tokens(excel_prompt), settings.PROMPT_TOKEN_BUDGET)
+        self.assertTrue(excel_prompt.rstrip().endswith(self.INSTRUCTIONS))
+
+    @override_settings(JOB_QUEUE_EAGER=True, RESUME_ANALYSIS_WAIT_SECONDS=0, PROMPT_TOKEN_BUDGET=1200)
+    def test_every_turn_prompt_fits_a_small_budget(self):
+        prompts = []
+
+        def respond(prompt):
+            prompts.append(prompt)
+            return '7' if 'Return only the numeric score' in prompt else 'Next question?'
+
+        set_llm_factory(lambda model_id, **kwargs: FakeLLM(model_id, responses=respond))
+        self.addCleanup(set_llm_factory, None)
+        candidate = Candidate.objects.create(
+            email='small-budget@example.com',
+            resume='resumes/resume.pdf',
+            analysis_status='READY',
+            resume_analysis={'raw_text': 'Excel analyst ' * 5000, 'excel_proficiency': 'Advanced', 'has_excel_experience': True, 'skills': []}
+        )
+        service = InterviewService()
+        interview_id = service.start_interview(candidate.id)['interview_id']
+        for answer in ("Sam", "dashboards " * 5000, "formula " * 5000, "macros " * 5000):
+            with self.captureOnCommitCallbacks(execute=True):
+                service.process_response(interview_id, answer)
+        # Greeting, two resume questions, two Excel questions and the scoring of each answer
+        self.assertGreaterEqual(len(prompts), 7)
+        for prompt in prompts:
+            self.assertLessEqual(count_tokens(prompt), 1200)
+            # The excerpts were cut, the closing instructions were not
+            self.assertIn(TRUNCATION_MARKER, prompt)
+            self.assertNotIn(TRUNCATION_MARKER.strip(), prompt.rstrip()[-200:])
+
+
+@override_settings(RESUME_ANALYSIS_WAIT_SECONDS=1)
+class AsyncResumeAnalysisWaitTest(TestCase):
+    """Waiting for a resume analysis doesn't hold the thread async ORM calls share"""
+
+    async def test_wait_does_not_block_other_queries(self):
+        candidate = await Candidate.objects.acreate(
+            email='waiting@example.com', resume='resumes/resume.pdf', analysis_status='PROCESSING'
+        )
+        start = asyncio.ensure_future(InterviewService().astart_interview(candidate.id))
+        await asyncio.sleep(0.1)
+        began = time.monotonic()
+        self.assertTrue(await Candidate.objects.filter(id=candidate.id).aexists())
+        self.assertLess(time.monotonic() - began, 0.3)
+        with self.assertRaises(ResumeAnalysisPending):
+            await start
@@ -22,6 +22,9 @@ export class HrpanelComponent implements OnInit {
   loading = false;
   loginError = '';
   interviews: any[] = [];
+  // Cursor for the next (older) page of interviews, null when there are no more
+  nextCursor: string | null = null;
+  loadingInterviews = false;
   selectedEmail: string = '';
   selectedInterview: any = null;
   report: any = null;
@@ -133,9 +136,33 @@ export class HrpanelComponent implements OnInit {
   }
 
   fetchInterviews() {
-    this.http.get<any>('https://ai-interviewer-1r06.onrender.com/api/interview/responses/')
-      .subscribe(res => {
-        this.interviews = res.interviews || [];
+    this.interviews = [];
+    this.nextCursor = null;
+    this.loadInterviewPage();
+  }
+
+  loadMoreInterviews() {
+    if (this.nextCursor) {
+      this.loadInterviewPage(this.nextCursor);
+    }
+  }
+
+  private loadInterviewPage(cursor?: string) {
+    const params: any = { limit: 50 };
+    if (cursor) {
+      params.cursor = cursor;
+    }
+    this.loadingInterviews = true;
+    this.http.get<any>('https://ai-interviewer-1r06.onrender.com/api/interview/responses/', { params })
+      .subscribe({
+        next: (res) => {
+          this.interviews = this.interviews.concat(res.interviews || []);
+          this.nextCursor = res.next_cursor || null;
+          this.loadingInterviews = false;
+        },
+        error: () => {
+          this.loadingInterviews = false;
+        }
       });
   }
 
@@ -156,8 +183,13 @@ export class HrpanelComponent implements OnInit {
     this.http.get<any>(`https://ai-interviewer-1r06.onrender.com/api/interview/report/${this.selectedInterview.interview_id}/`)
       .subscribe({
         next: (res) => {
-          this.report = res;
           this.loadingReport = false;
+          // The detailed report is generated in the background after the interview ends
+          if (res.report_status === 'PENDING') {
+            alert('The report for this interview is still being generated. Please try again shortly.');
+            return;
+          }
+          this.report = res;
           this.showReportPopup = true;
         },
         error: () => {
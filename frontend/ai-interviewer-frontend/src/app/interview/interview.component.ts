@@ -344,21 +344,23 @@ export class InterviewComponent implements OnInit, OnDestroy, AfterViewChecked {
     }
 
     // Start the interview session with backend
+    this.requestInterviewStart();
+  }
+
+  requestInterviewStart() {
     this.http.post<any>(`https://ai-interviewer-1r06.onrender.com/api/interview/start/${this.candidateId}/`, {})
       .subscribe(
         response => {
+          // Resume analysis still running in the background - try again shortly
+          if (response.status === 'ANALYSIS_PENDING') {
+            setTimeout(() => this.requestInterviewStart(), 3000);
+            return;
+          }
           this.interviewId = response.text_response.interview_id;
           console.log('Interview started. Interview ID:', this.interviewId);
           this.currentQuestion = response.text_response.message;
-          // Decode base64 audio and play
-          const binaryString = window.atob(response.audio_response);
-          const bytes = new Uint8Array(binaryString.length);
-          for (let i = 0; i < binaryString.length; i++) {
-            bytes[i] = binaryString.charCodeAt(i);
-          }
-          const audioBlob = new Blob([bytes], { type: 'audio/mp3' });
-          const audioUrl = URL.createObjectURL(audioBlob);
-          this.audioPlayer.nativeElement.src = audioUrl;
+          // Audio is served as a separate binary resource
+          this.audioPlayer.nativeElement.src = response.audio_url;
           this.audioPlayer.nativeElement.play();
           // Start face monitoring
           this.startFaceMonitoring();
@@ -557,15 +559,8 @@ export class InterviewComponent implements OnInit, OnDestroy, AfterViewChecked {
         response => {
           this.transcript = response.transcribed_text;
           this.currentQuestion = response.text_response.message;
-          // Decode base64 audio and play
-          const binaryString = window.atob(response.audio_response);
-          const bytes = new Uint8Array(binaryString.length);
-          for (let i = 0; i < binaryString.length; i++) {
-            bytes[i] = binaryString.charCodeAt(i);
-          }
-          const audioBlob = new Blob([bytes], { type: 'audio/mp3' });
-          const audioUrl = URL.createObjectURL(audioBlob);
-          this.audioPlayer.nativeElement.src = audioUrl;
+          // Audio is served as a separate binary resource
+          this.audioPlayer.nativeElement.src = response.audio_url;
 
           // If interview is complete, show popup only after audio ends
           if (response.interview_complete === true) {